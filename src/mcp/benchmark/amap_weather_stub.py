@@ -0,0 +1,95 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 高德天气接口的本地桩服务：返回固定格式的实况和预报数据，reporttime 按设定的间隔前进，供天气缓存离线测试
+REPORT_TIMEZONE = timezone(timedelta(hours=8))
+
+def beijing_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, REPORT_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+
+class WeatherStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 最近一次“发布”数据的时间戳，publish_interval 大于 0 时按间隔自动前进
+    published_at = 0.0
+    publish_interval = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    @classmethod
+    def publish(cls, timestamp: float = None):
+        """发布一次新数据：reporttime 更新为指定时间（默认当前时间）"""
+        cls.published_at = time.time() if timestamp is None else timestamp
+
+    @classmethod
+    def reporttime(cls) -> str:
+        if cls.publish_interval > 0:
+            now = time.time()
+            while cls.published_at + cls.publish_interval <= now:
+                cls.published_at += cls.publish_interval
+        return beijing_time(cls.published_at)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        with self.lock:
+            WeatherStubHandler.requests += 1
+            reporttime = self.reporttime()
+        city = params.get("city", [""])[0]
+        extensions = params.get("extensions", ["base"])[0]
+        if not city.isdigit():
+            body = {"status": "0", "info": "INVALID_PARAMS"}
+        elif extensions == "all":
+            cast = {
+                "date": reporttime[:10], "week": "1", "dayweather": "晴", "nightweather": "多云",
+                "daytemp": "20", "nighttemp": "10", "daywind": "北", "nightwind": "北",
+                "daypower": "1-3", "nightpower": "1-3"
+            }
+            body = {"status": "1", "forecasts": [
+                {"city": f"测试城市{city}", "adcode": city, "province": "测试省", "reporttime": reporttime, "casts": [cast] * 4}
+            ]}
+        else:
+            body = {"status": "1", "lives": [{
+                "city": f"测试城市{city}", "adcode": city, "weather": "晴", "temperature": "20",
+                "winddirection": "北", "windpower": "≤3", "humidity": "40", "reporttime": reporttime
+            }]}
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_weather_stub(host: str = "127.0.0.1", port: int = 0, publish_interval: float = 0) -> ThreadingHTTPServer:
+    """在后台线程中启动桩服务，port 为 0 时自动分配端口（通过 server.server_port 获取）"""
+    WeatherStubHandler.publish()
+    WeatherStubHandler.publish_interval = publish_interval
+    WeatherStubHandler.requests = 0
+    server = ThreadingHTTPServer((host, port), WeatherStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="高德天气接口的本地桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--publish-interval", type=float, default=60, help="reporttime 前进的间隔（秒，0 表示不前进）")
+    options = parser.parse_args()
+
+    server = start_weather_stub(options.host, options.port, options.publish_interval)
+    print(f"GAODE_WEATHER_URL=http://{options.host}:{server.server_port}/v3/weather/weatherInfo")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from serp_fixture_server import start_fixture_server
+
+# 谷歌搜索服务的离线基准测试：浏览器指向本地夹具服务，分别测量逐个搜索、google_search_many 并行搜索、缓存命中和并发合并
+BENCHMARK_DIR = Path(__file__).parent
+SEARCH_SERVER = BENCHMARK_DIR.parent / "servers" / "google_search_server.py"
+PROJECT_ROOT = BENCHMARK_DIR.parent.parent.parent
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / "benchmark_results"
+
+def result_text(result) -> str:
+    return "\n".join(getattr(item, "text", "") for item in result.content)
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return round((time.perf_counter() - started) * 1000, 1)
+
+async def run_scenarios(session: ClientSession, options: argparse.Namespace, fixture_server) -> dict:
+    queries = [f"benchmark query {i}" for i in range(options.queries)]
+    many_queries = [f"benchmark many {i}" for i in range(options.queries)]
+    report = {}
+
+    async def search_sequential(items: List[str]):
+        for query in items:
+            result = await session.call_tool("google_search", {"query": query})
+            if result.isError or result_text(result).startswith("⚠️"):
+                raise RuntimeError(result_text(result))
+
+    def scenario(name: str, wall_ms: float, searches: int, page_loads_before: int):
+        report[name] = {
+            "wall_ms": wall_ms,
+            "searches": searches,
+            "per_search_ms": round(wall_ms / searches, 1) if searches else 0.0,
+            "page_loads": fixture_server.RequestHandlerClass.requests - page_loads_before
+        }
+        r = report[name]
+        print(f"{name:<12} {r['searches']:>3} 次搜索  总计 {r['wall_ms']:>9.1f}ms  平均 {r['per_search_ms']:>8.1f}ms  结果页加载 {r['page_loads']}")
+
+    # 预热：浏览器池启动和首次页面加载不计入结果
+    await session.call_tool("google_search", {"query": "benchmark warmup"})
+
+    loads = fixture_server.RequestHandlerClass.requests
+    scenario("sequential", await timed(search_sequential(queries)), len(queries), loads)
+
+    loads = fixture_server.RequestHandlerClass.requests
+    many = session.call_tool("google_search_many", {"queries": many_queries, "per_query_limit": 5})
+    scenario("many", await timed(many), len(many_queries), loads)
+
+    loads = fixture_server.RequestHandlerClass.requests
+    scenario("cached", await timed(search_sequential(queries)), len(queries), loads)
+
+    loads = fixture_server.RequestHandlerClass.requests
+    same = asyncio.gather(*(
+        session.call_tool("google_search", {"query": "benchmark coalesced"}) for _ in range(options.queries)
+    ))
+    scenario("coalesced", await timed(same), options.queries, loads)
+
+    stats = await session.call_tool("google_search_stats", {})
+    report["server_stats"] = json.loads(result_text(stats))
+    return report
+
+async def main():
+    parser = argparse.ArgumentParser(description="谷歌搜索服务的离线基准测试（需要本地 Chrome 和 ChromeDriver）")
+    parser.add_argument("--queries", type=int, default=8, help="每个场景的查询数")
+    parser.add_argument("--pool-size", type=int, default=4, help="浏览器池大小")
+    parser.add_argument("--mode", default="fast", choices=["fast", "human"], help="搜索路径")
+    parser.add_argument("--delay-ms", type=float, default=200, help="夹具服务返回结果页前的模拟网络延迟（毫秒）")
+    parser.add_argument("--fixture", default="google_zh_ads.html", help="fixtures/serp 下的结果页文件名")
+    parser.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="结果 JSON 的保存目录")
+    parser.add_argument("--verbose", action="store_true", help="输出搜索服务的日志")
+    options = parser.parse_args()
+
+    fixture_server = start_fixture_server(fixture=options.fixture, delay_ms=options.delay_ms)
+    env = dict(
+        os.environ,
+        GOOGLE_SEARCH_URL=f"http://127.0.0.1:{fixture_server.server_port}/search",
+        GOOGLE_SEARCH_MODE=options.mode,
+        GOOGLE_DRIVER_POOL_SIZE=str(options.pool_size),
+        GOOGLE_DRIVER_PREWARM=str(options.pool_size),
+        GOOGLE_SEARCH_CACHE_TTL="600",
+        # 夹具服务在本机，不经过代理
+        PROXY=""
+    )
+    params = StdioServerParameters(command=sys.executable, args=[str(SEARCH_SERVER)], env=env)
+    errlog = sys.stderr if options.verbose else open(os.devnull, "w")
+    try:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                report = await run_scenarios(session, options, fixture_server)
+    finally:
+        fixture_server.shutdown()
+
+    report["meta"] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "queries": options.queries,
+        "pool_size": options.pool_size,
+        "mode": options.mode,
+        "delay_ms": options.delay_ms,
+        "fixture": options.fixture
+    }
+    os.makedirs(options.output_dir, exist_ok=True)
+    output_file = os.path.join(options.output_dir, datetime.now().strftime("%Y%m%d-%H%M%S") + "-google-search.json")
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output_file}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
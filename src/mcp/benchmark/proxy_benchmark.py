@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 代理的开销基准测试：通过真实的 stdio ClientSession 分别直连桩后端和经代理调用，对比吞吐、延迟和代理进程的 CPU/内存
+BENCHMARK_DIR = Path(__file__).parent
+STUBS_DIR = BENCHMARK_DIR / "stubs"
+PROJECT_ROOT = BENCHMARK_DIR.parent.parent.parent
+PROXY_SCRIPT = BENCHMARK_DIR.parent / "proxy" / "proxy_server.py"
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / "benchmark_results"
+
+# 场景名 -> (桩后端脚本, 工具名)
+STUBS = {
+    "echo": ("echo_stub_server.py", "echo"),
+    "sleep": ("sleep_stub_server.py", "sleep"),
+    "payload": ("payload_stub_server.py", "payload"),
+}
+
+def scenario_args(scenario: str, options: argparse.Namespace) -> dict:
+    """各场景的工具参数"""
+    if scenario == "sleep":
+        return {"ms": options.sleep_ms}
+    if scenario == "payload":
+        return {"size_kb": options.payload_kb}
+    return {"text": "ping"}
+
+def child_pids() -> set:
+    """当前进程的直接子进程，用来找到 stdio_client 拉起的进程"""
+    if psutil is not None:
+        return {child.pid for child in psutil.Process().children()}
+    pids = set()
+    for stat_file in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat_file.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == os.getpid():
+            pids.add(int(stat_file.parent.name))
+    return pids
+
+def process_usage(pid: Optional[int]) -> Optional[Dict[str, float]]:
+    """读取进程累计 CPU 时间（秒）和常驻内存（MB），平台不支持时返回 None"""
+    if pid is None:
+        return None
+    try:
+        if psutil is not None:
+            process = psutil.Process(pid)
+            cpu = process.cpu_times()
+            return {"cpu_s": cpu.user + cpu.system, "rss_mb": process.memory_info().rss / 1024 / 1024}
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        rss_pages = int(fields[21])
+        return {
+            "cpu_s": (int(fields[11]) + int(fields[12])) / ticks,
+            "rss_mb": rss_pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+        }
+    except (OSError, ValueError, IndexError) as e:
+        print(f"⚠️ 无法读取进程 {pid} 的资源占用: {str(e)}", file=sys.stderr)
+        return None
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run_load(session: ClientSession, tool: str, args: dict, requests: int, concurrency: int) -> dict:
+    """以固定并发数发起 requests 次调用，返回每次调用的延迟和错误数"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, args)
+                if result.isError:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "wall_s": time.perf_counter() - started}
+
+async def bench_target(
+    target: str,
+    params: StdioServerParameters,
+    scenarios: List[str],
+    options: argparse.Namespace,
+    errlog
+) -> List[dict]:
+    """连接一个目标（桩后端或代理），依次跑各场景和并发数"""
+    results = []
+    before = child_pids()
+    async with stdio_client(params, errlog=errlog) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            # 代理在后台启动后端，列出工具会等待后端全部就绪
+            await session.list_tools()
+            spawned = child_pids() - before
+            pid = spawned.pop() if len(spawned) == 1 else None
+
+            for scenario in scenarios:
+                tool = STUBS[scenario][1]
+                args = scenario_args(scenario, options)
+                await run_load(session, tool, args, options.warmup, 1)
+                for concurrency in options.concurrency:
+                    usage_before = process_usage(pid)
+                    load = await run_load(session, tool, args, options.requests, concurrency)
+                    usage_after = process_usage(pid)
+
+                    latencies = sorted(load["latencies"])
+                    result = {
+                        "target": target,
+                        "scenario": scenario,
+                        "concurrency": concurrency,
+                        "requests": len(latencies),
+                        "errors": load["errors"],
+                        "throughput_rps": round(len(latencies) / load["wall_s"], 1),
+                        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+                        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+                        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                        "cpu_s": None,
+                        "cpu_pct": None,
+                        "rss_mb": None
+                    }
+                    if usage_before and usage_after:
+                        cpu_s = usage_after["cpu_s"] - usage_before["cpu_s"]
+                        result["cpu_s"] = round(cpu_s, 3)
+                        result["cpu_pct"] = round(cpu_s / load["wall_s"] * 100, 1)
+                        result["rss_mb"] = round(usage_after["rss_mb"], 1)
+                    results.append(result)
+                    print(format_row(result), flush=True)
+    return results
+
+def format_row(result: dict) -> str:
+    cpu = "-" if result["cpu_pct"] is None else f"{result['cpu_pct']:.1f}%"
+    rss = "-" if result["rss_mb"] is None else f"{result['rss_mb']:.1f}MB"
+    return (
+        f"{result['target']:<7} {result['scenario']:<8} c={result['concurrency']:<4} "
+        f"{result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.3f}ms  p99 {result['p99_ms']:>8.3f}ms  "
+        f"cpu {cpu:>7}  rss {rss:>8}  errors {result['errors']}"
+    )
+
+def write_proxy_config(scenarios: List[str], directory: str) -> str:
+    """为代理生成只包含桩后端的 servers.json"""
+    servers = [{"name": f"{scenario}-stub", "script": STUBS[scenario][0]} for scenario in scenarios]
+    config_file = os.path.join(directory, "servers.json")
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump(servers, f, ensure_ascii=False, indent=2)
+    return config_file
+
+def summarize_overhead(results: List[dict]) -> List[dict]:
+    """按场景和并发数对比代理与直连，得到代理带来的延迟开销和吞吐变化"""
+    direct = {(r["scenario"], r["concurrency"]): r for r in results if r["target"] == "direct"}
+    summary = []
+    for r in results:
+        base = direct.get((r["scenario"], r["concurrency"]))
+        if r["target"] != "proxy" or base is None:
+            continue
+        summary.append({
+            "scenario": r["scenario"],
+            "concurrency": r["concurrency"],
+            "p50_overhead_ms": round(r["p50_ms"] - base["p50_ms"], 3),
+            "p99_overhead_ms": round(r["p99_ms"] - base["p99_ms"], 3),
+            "throughput_ratio": round(r["throughput_rps"] / base["throughput_rps"], 3) if base["throughput_rps"] else None
+        })
+    return summary
+
+def compare_with_baseline(results: List[dict], baseline_file: str, max_regression: float) -> bool:
+    """与之前保存的结果对比代理路径，吞吐下降或 p50 上升超过阈值（百分比）时返回 False"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {
+            (r["target"], r["scenario"], r["concurrency"]): r
+            for r in json.load(f)["results"]
+        }
+    ok = True
+    print(f"\n与基线 {baseline_file} 对比（阈值 {max_regression:.0f}%）：")
+    for r in results:
+        base = baseline.get((r["target"], r["scenario"], r["concurrency"]))
+        if base is None or r["target"] != "proxy":
+            continue
+        throughput_change = (r["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"] * 100
+        p50_change = (r["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100 if base["p50_ms"] else 0.0
+        regressed = throughput_change < -max_regression or p50_change > max_regression
+        ok = ok and not regressed
+        print(
+            f"{'❌' if regressed else '✅'} {r['scenario']:<8} c={r['concurrency']:<4} "
+            f"throughput {throughput_change:+.1f}%  p50 {p50_change:+.1f}%"
+        )
+    return ok
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="代理服务器开销基准测试（桩后端，完全离线）")
+    parser.add_argument("--scenarios", default="echo,sleep,payload", help="逗号分隔的场景：echo、sleep、payload")
+    parser.add_argument("--targets", default="direct,proxy", help="逗号分隔的目标：direct（直连桩后端）、proxy（经代理）")
+    parser.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发数")
+    parser.add_argument("--requests", type=int, default=500, help="每个场景、每个并发数的调用次数")
+    parser.add_argument("--warmup", type=int, default=20, help="每个场景正式计时前的预热调用次数")
+    parser.add_argument("--sleep-ms", type=float, default=20, help="sleep 场景的固定延迟（毫秒）")
+    parser.add_argument("--payload-kb", type=int, default=256, help="payload 场景的结果大小（KB）")
+    parser.add_argument("--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="结果 JSON 的保存目录")
+    parser.add_argument("--label", default="", help="写入结果文件名和元数据的标签")
+    parser.add_argument("--compare", help="与之前保存的结果文件对比，代理路径回退超过阈值时以非零状态退出")
+    parser.add_argument("--max-regression", type=float, default=10, help="允许的回退百分比")
+    parser.add_argument("--verbose", action="store_true", help="输出代理和桩后端的日志")
+    options = parser.parse_args()
+    options.scenarios = [s for s in options.scenarios.split(",") if s]
+    options.targets = [t for t in options.targets.split(",") if t]
+    options.concurrency = [int(c) for c in options.concurrency.split(",") if c]
+    unknown = [s for s in options.scenarios if s not in STUBS] + [t for t in options.targets if t not in ("direct", "proxy")]
+    if unknown:
+        parser.error(f"未知的场景或目标: {', '.join(unknown)}")
+    return options
+
+async def main():
+    options = parse_args()
+    errlog = sys.stderr if options.verbose else open(os.devnull, "w")
+    python = sys.executable
+    results: List[dict] = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if "direct" in options.targets:
+            for scenario in options.scenarios:
+                params = StdioServerParameters(command=python, args=[str(STUBS_DIR / STUBS[scenario][0])])
+                results += await bench_target("direct", params, [scenario], options, errlog)
+
+        if "proxy" in options.targets:
+            env = dict(
+                os.environ,
+                CONFIG_FILE=write_proxy_config(options.scenarios, tmp_dir),
+                SERVERS_DIR=str(STUBS_DIR),
+                TOOL_MANIFEST_FILE=os.path.join(tmp_dir, "tool_manifest.json"),
+                PROXY_LAZY_START="false",
+                CONFIG_WATCH_INTERVAL="0",
+                METRICS_FILE="",
+                METRICS_PORT="0"
+            )
+            params = StdioServerParameters(command=python, args=[str(PROXY_SCRIPT)], env=env)
+            results += await bench_target("proxy", params, options.scenarios, options, errlog)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "label": options.label,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests": options.requests,
+            "sleep_ms": options.sleep_ms,
+            "payload_kb": options.payload_kb
+        },
+        "results": results,
+        "overhead": summarize_overhead(results)
+    }
+    for item in report["overhead"]:
+        print(
+            f"overhead {item['scenario']:<8} c={item['concurrency']:<4} "
+            f"p50 {item['p50_overhead_ms']:+.3f}ms  p99 {item['p99_overhead_ms']:+.3f}ms  "
+            f"throughput x{item['throughput_ratio']}"
+        )
+
+    os.makedirs(options.output_dir, exist_ok=True)
+    name = datetime.now().strftime("%Y%m%d-%H%M%S") + (f"-{options.label}" if options.label else "")
+    output_file = os.path.join(options.output_dir, f"{name}.json")
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output_file}")
+
+    if options.compare and not compare_with_baseline(results, options.compare, options.max_regression):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
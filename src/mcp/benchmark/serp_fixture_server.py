@@ -0,0 +1,78 @@
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# 本地结果页夹具服务：/search 返回保存的结果页 HTML，/ 返回带搜索框的首页，供谷歌搜索服务离线测试和基准测试
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "serp"
+DEFAULT_FIXTURE = "google_zh_ads.html"
+
+HOME_PAGE = """<!doctype html><html><head><meta charset="UTF-8"><title>Google</title></head>
+<body><form action="/search" method="get"><input name="q" type="text"><input type="submit" value="Search"></form></body></html>"""
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fixture_html = ""
+    delay_ms = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/search":
+            with self.lock:
+                FixtureHandler.requests += 1
+            if self.delay_ms > 0:
+                time.sleep(self.delay_ms / 1000)
+            query = parse_qs(url.query).get("q", [""])[0]
+            # 标题中带上查询词，便于确认返回的是哪次查询
+            body = self.fixture_html.replace("<title>", f"<title>{query} ", 1)
+        elif url.path == "/":
+            body = HOME_PAGE
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_fixture_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    fixture: str = DEFAULT_FIXTURE,
+    delay_ms: float = 0
+) -> ThreadingHTTPServer:
+    """在后台线程中启动夹具服务，port 为 0 时自动分配端口（通过 server.server_port 获取）"""
+    FixtureHandler.fixture_html = (FIXTURES_DIR / fixture).read_text(encoding="utf-8")
+    FixtureHandler.delay_ms = delay_ms
+    FixtureHandler.requests = 0
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="本地结果页夹具服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="fixtures/serp 下的结果页文件名")
+    parser.add_argument("--delay-ms", type=float, default=0, help="每次返回结果页前的模拟网络延迟（毫秒）")
+    options = parser.parse_args()
+
+    server = start_fixture_server(options.host, options.port, options.fixture, options.delay_ms)
+    print(f"GOOGLE_SEARCH_URL=http://{options.host}:{server.server_port}/search")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# 搜索结果页解析的微基准：先用保存的结果页 HTML 校验提取结果，再统计单次解析耗时
+BENCHMARK_DIR = Path(__file__).parent
+FIXTURES_DIR = BENCHMARK_DIR / "fixtures" / "serp"
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "servers"))
+
+from serp_parser import parse_results
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def check_fixture(name: str, html: str, expected: list) -> bool:
+    """与 expected.json 中的期望结果逐条对比，输出不一致的条目"""
+    results = parse_results(html, limit=10)
+    ok = results == expected
+    if not ok:
+        print(f"✗ {name}: 期望 {len(expected)} 条，实际 {len(results)} 条")
+        for index in range(max(len(results), len(expected))):
+            got = results[index] if index < len(results) else None
+            want = expected[index] if index < len(expected) else None
+            if got != want:
+                print(f"  #{index + 1}\n    实际: {got}\n    期望: {want}")
+    return ok
+
+def bench_fixture(html: str, iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        parse_results(html, limit=10)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "size_kb": round(len(html.encode("utf-8")) / 1024, 1),
+        "iterations": iterations,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": round(percentile(timings, 0.5), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "max_ms": round(timings[-1], 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索结果页解析的正确性校验和微基准（完全离线）")
+    parser.add_argument("--iterations", type=int, default=200, help="每个结果页的解析次数")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="结果页 HTML 和 expected.json 所在目录")
+    parser.add_argument("--check-only", action="store_true", help="只校验提取结果，不计时")
+    parser.add_argument("--output", help="把计时结果保存为 JSON 文件")
+    options = parser.parse_args()
+
+    fixtures_dir = Path(options.fixtures)
+    with open(fixtures_dir / "expected.json", "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    all_ok = True
+    report = {}
+    for name, expected_results in expected.items():
+        html = (fixtures_dir / name).read_text(encoding="utf-8")
+        ok = check_fixture(name, html, expected_results)
+        all_ok = all_ok and ok
+        if options.check_only:
+            print(f"{'✓' if ok else '✗'} {name}")
+            continue
+        report[name] = dict(correct=ok, **bench_fixture(html, max(1, options.iterations)))
+        r = report[name]
+        print(
+            f"{'✓' if ok else '✗'} {name:<28} {r['size_kb']:>7.1f}KB  "
+            f"mean {r['mean_ms']:.2f}ms  p50 {r['p50_ms']:.2f}ms  p95 {r['p95_ms']:.2f}ms  max {r['max_ms']:.2f}ms"
+        )
+
+    if options.output and report:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {options.output}")
+    if not all_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
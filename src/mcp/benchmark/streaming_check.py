@@ -0,0 +1,71 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import AsyncIterator, List
+
+# 客户端流式输出的离线校验：用脚本化的模型输出检查工具调用的提前截断，以及普通回答中的 JSON 示例不被截断或隐藏
+BENCHMARK_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "client"))
+
+from llm_providers import LLMProvider, Messages
+from mcp_client import MCPClient
+
+TOOL_CALL = '```json\n{"action": "call_tool", "tool": "query_weather", "args": {"city": "110000"}}\n```'
+EXAMPLE_JSON = '```json\n{"name": "demo", "value": 1}\n```'
+
+class ScriptedProvider(LLMProvider):
+    """按固定大小分段输出预先写好的文本，记录被读取的分段数"""
+    name = "Scripted"
+
+    def __init__(self, text: str, chunk_size: int = 3):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.consumed = 0
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+async def run_case(text: str):
+    provider = ScriptedProvider(text)
+    client = MCPClient(provider)
+    shown: List[str] = []
+    content, tool_data = await client.generate([], shown.append, lambda: None)
+    return provider, content, tool_data, "".join(shown)
+
+async def run_checks() -> bool:
+    all_ok = True
+
+    def check(name: str, ok: bool, detail: str = ""):
+        nonlocal all_ok
+        all_ok = all_ok and ok
+        print(f"{'✓' if ok else '✗'} {name}{'  ' + detail if detail else ''}")
+
+    answer = "北京今天晴。"
+    provider, content, tool_data, shown = await run_case(answer)
+    check("普通回答完整显示", content == answer and shown == answer and tool_data is None, repr(shown))
+
+    text = f"我来查一下。\n{TOOL_CALL}\n模型多余的输出"
+    provider, content, tool_data, shown = await run_case(text)
+    check("工具调用完整后立即停止读取", tool_data is not None and provider.consumed < len(provider.chunks),
+          f"读取 {provider.consumed}/{len(provider.chunks)} 段")
+    check("工具调用 JSON 不显示", shown == "我来查一下。\n", repr(shown))
+
+    text = f"这是示例：\n{EXAMPLE_JSON}\n后面的解释…"
+    provider, content, tool_data, shown = await run_case(text)
+    check("非工具调用的 JSON 示例不截断回答", tool_data is None and content == text,
+          f"读取 {provider.consumed}/{len(provider.chunks)} 段")
+    check("非工具调用的 JSON 示例完整显示", shown == text, repr(shown))
+
+    text = f"示例：\n{EXAMPLE_JSON}\n然后查询：\n{TOOL_CALL}"
+    provider, content, tool_data, shown = await run_case(text)
+    check("JSON 示例之后的工具调用仍能识别", tool_data is not None and tool_data.get("tool") == "query_weather")
+    check("JSON 示例显示、工具调用隐藏", shown == f"示例：\n{EXAMPLE_JSON}\n然后查询：\n", repr(shown))
+    return all_ok
+
+def main():
+    if not asyncio.run(run_checks()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from mcp.server.fastmcp import FastMCP
+
+# 基准测试用的回显后端，几乎没有处理耗时，用来测量纯粹的转发开销
+mcp = FastMCP("EchoStubServer")
+
+@mcp.tool(description="原样返回输入文本")
+async def echo(text: str) -> str:
+    return text
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
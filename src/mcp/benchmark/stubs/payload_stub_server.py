@@ -0,0 +1,16 @@
+from functools import lru_cache
+from mcp.server.fastmcp import FastMCP
+
+# 基准测试用的大结果后端，测量大响应在代理中的序列化和拷贝开销
+mcp = FastMCP("PayloadStubServer")
+
+@lru_cache(maxsize=8)
+def make_payload(size_kb: int) -> str:
+    return "x" * (size_kb * 1024)
+
+@mcp.tool(description="返回指定大小（KB）的文本")
+async def payload(size_kb: int = 256) -> str:
+    return make_payload(size_kb)
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,13 @@
+import asyncio
+from mcp.server.fastmcp import FastMCP
+
+# 基准测试用的固定延迟后端，模拟调用外部 API 的工具
+mcp = FastMCP("SleepStubServer")
+
+@mcp.tool(description="等待指定毫秒数后返回")
+async def sleep(ms: float = 20) -> str:
+    await asyncio.sleep(ms / 1000)
+    return f"slept {ms}ms"
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from amap_weather_stub import WeatherStubHandler, start_weather_stub
+
+# 天气缓存的离线校验：天气服务指向本地桩服务，缩短发布间隔后依次检查命中、按 reporttime 过期、旧数据重查间隔和重启后从文件载入
+BENCHMARK_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "servers"))
+
+async def run_checks(options: argparse.Namespace) -> bool:
+    # 配置在导入时读取，必须先设置环境变量
+    import weather_server
+
+    all_ok = True
+
+    def check(name: str, ok: bool, detail: str = ""):
+        nonlocal all_ok
+        all_ok = all_ok and ok
+        print(f"{'✓' if ok else '✗'} {name}{'  ' + detail if detail else ''}")
+
+    def requests() -> int:
+        return WeatherStubHandler.requests
+
+    tool = weather_server.GaodeWeatherTool()
+    try:
+        first = await tool.query_weather(options.city)
+        check("首次查询请求接口", requests() == 1 and "error" not in first, f"接口请求 {requests()} 次")
+
+        await tool.query_weather(options.city)
+        check("reporttime 加发布间隔之前命中缓存", requests() == 1, f"接口请求 {requests()} 次")
+
+        await asyncio.sleep(options.live_interval + 0.2)
+        stale = await tool.query_weather(options.city)
+        check("超过发布间隔后重新请求", requests() == 2, f"接口请求 {requests()} 次")
+        check("接口未发布新数据时 reporttime 不变", stale.get("reporttime") == first.get("reporttime"))
+
+        await tool.query_weather(options.city)
+        check("旧数据在重查间隔内命中缓存", requests() == 2, f"接口请求 {requests()} 次")
+
+        WeatherStubHandler.publish()
+        await asyncio.sleep(options.recheck_interval + 0.2)
+        fresh = await tool.query_weather(options.city)
+        check("重查间隔后取到新发布的数据", requests() == 3 and fresh.get("reporttime") != first.get("reporttime"),
+              f"接口请求 {requests()} 次，reporttime {fresh.get('reporttime')}")
+    finally:
+        await tool.close()
+
+    restarted = weather_server.GaodeWeatherTool()
+    try:
+        await restarted.query_weather(options.city)
+        check("重启后从缓存文件载入", requests() == 3, f"接口请求 {requests()} 次")
+    finally:
+        await restarted.close()
+    return all_ok
+
+def main():
+    parser = argparse.ArgumentParser(description="天气缓存的离线校验（使用本地高德天气桩服务）")
+    parser.add_argument("--city", default="110000", help="查询的城市代码")
+    parser.add_argument("--live-interval", type=float, default=2, help="校验时使用的实况发布间隔（秒）")
+    parser.add_argument("--recheck-interval", type=float, default=1, help="校验时使用的旧数据重查间隔（秒）")
+    options = parser.parse_args()
+
+    server = start_weather_stub()
+    cache_dir = tempfile.mkdtemp(prefix="weather-cache-check-")
+    cache_file = os.path.join(cache_dir, "weather_cache.db")
+    os.environ.update(
+        GAODE_API_KEY="stub",
+        GAODE_WEATHER_URL=f"http://127.0.0.1:{server.server_port}/v3/weather/weatherInfo",
+        WEATHER_CACHE_ENABLED="true",
+        WEATHER_CACHE_FILE=cache_file,
+        WEATHER_LIVE_INTERVAL=str(options.live_interval),
+        WEATHER_RECHECK_INTERVAL=str(options.recheck_interval)
+    )
+    started = time.perf_counter()
+    try:
+        ok = asyncio.run(run_checks(options))
+    finally:
+        server.shutdown()
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        os.rmdir(cache_dir)
+    print(f"\n耗时 {time.perf_counter() - started:.1f}s")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
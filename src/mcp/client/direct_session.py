@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from mcp import types
+
+# 配置解析和后端连接与代理共用同一份实现（proxy/backends.py）
+sys.path.append(str(Path(__file__).parent.parent / "proxy"))
+from backends import BackendConnection, read_server_config
+
+logger = logging.getLogger("DirectSession")
+
+MessageHandler = Callable[[Any], Awaitable[None]]
+
+class DirectSession:
+    """直连模式：读取 servers.json，在客户端进程内连接所有后端并按工具名直接分发调用，省去代理这一跳
+
+    提供 MCPClient 用到的 list_tools / call_tool 接口，可以替代连接代理的 ClientSession。
+    配置校验、副本数（replicas）和工具路由规则与代理相同：按配置顺序注册，同名工具以后注册的后端为准，
+    每次调用分发给在途请求最少的可用副本。
+    """
+
+    def __init__(
+        self,
+        config_file: str,
+        servers_dir: str,
+        message_handler: Optional[MessageHandler] = None,
+        startup_timeout: float = 60
+    ):
+        self.config_file = config_file
+        self.servers_dir = servers_dir
+        self.message_handler = message_handler
+        self.startup_timeout = startup_timeout
+        # 后端名称 -> 已启动的副本连接
+        self.backends: Dict[str, List[BackendConnection]] = {}
+        self.tool_mapping: Dict[str, str] = {}
+
+    async def __aenter__(self) -> "DirectSession":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def start(self):
+        """并发启动所有后端的所有副本，单个副本失败不影响其他副本"""
+        servers = read_server_config(self.config_file)
+        started = time.perf_counter()
+
+        async def start_one(server: dict, replica: int) -> Optional[BackendConnection]:
+            connection = BackendConnection(server, replica, self.servers_dir, message_handler=self.message_handler)
+            timeout = float(server.get("startup_timeout", self.startup_timeout))
+            try:
+                await connection.start(timeout)
+            except Exception as e:
+                logger.error(f"启动后端 {connection.label} 失败: {str(e)}")
+                return None
+            logger.info(f"后端 {connection.label} 已启动，耗时 {connection.timings['total']:.2f}s")
+            return connection
+
+        connections = await asyncio.gather(*(
+            start_one(server, replica) for server in servers for replica in range(server.get("replicas", 1))
+        ))
+        for connection in connections:
+            if connection is not None:
+                self.backends.setdefault(connection.name, []).append(connection)
+        self.rebuild_routes()
+        logger.info(
+            f"直连模式启动完成，耗时 {time.perf_counter() - started:.2f}s，"
+            f"可用后端 {len(self.backends)}/{len(servers)}"
+        )
+
+    def tools_of(self, server_name: str) -> List[types.Tool]:
+        for connection in self.backends[server_name]:
+            if connection.is_running:
+                return connection.tools
+        return []
+
+    def rebuild_routes(self):
+        """按配置顺序重建工具到后端的路由表"""
+        self.tool_mapping = {}
+        for server_name in self.backends:
+            for tool in self.tools_of(server_name):
+                if tool.name in self.tool_mapping:
+                    logger.warning(f"工具 {tool.name} 同时由 {self.tool_mapping[tool.name]} 和 {server_name} 提供，使用后者")
+                self.tool_mapping[tool.name] = server_name
+
+    async def list_tools(self) -> types.ListToolsResult:
+        """重新获取各后端的工具列表并合并，同时刷新路由表"""
+        async def refresh(connection: BackendConnection):
+            if connection.is_running:
+                connection.tools = (await connection.session.list_tools()).tools
+
+        await asyncio.gather(*(
+            refresh(connection) for connections in self.backends.values() for connection in connections
+        ))
+        self.rebuild_routes()
+        tools: Dict[str, types.Tool] = {}
+        for server_name in self.backends:
+            for tool in self.tools_of(server_name):
+                if self.tool_mapping.get(tool.name) == server_name:
+                    tools[tool.name] = tool
+        return types.ListToolsResult(tools=list(tools.values()))
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> types.CallToolResult:
+        """按路由表把调用直接发给对应后端在途请求最少的可用副本"""
+        server_name = self.tool_mapping.get(name)
+        if server_name is None:
+            raise ValueError(f"未知工具: {name}")
+        available = [connection for connection in self.backends[server_name] if connection.is_available]
+        if not available:
+            raise RuntimeError(f"后端 {server_name} 暂不可用（未运行或熔断中）")
+        connection = min(available, key=lambda connection: connection.in_flight)
+        return await connection.call_tool(name, arguments or {})
+
+    async def stop(self):
+        """停止所有后端"""
+        await asyncio.gather(*(
+            connection.stop() for connections in self.backends.values() for connection in connections
+        ))
+        self.backends.clear()
+        self.tool_mapping.clear()
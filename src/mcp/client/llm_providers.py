@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger("LLMProvider")
+
+Messages = List[Dict[str, str]]
+
+class LLMProvider(ABC):
+    """大模型接口：以流式方式生成回复，逐段产出增量文本"""
+    name = "LLM"
+
+    @abstractmethod
+    def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """逐段产出模型回复的增量文本"""
+
+class DashScopeProvider(LLMProvider):
+    """阿里云 DashScope，同步 SDK 在后台线程中运行，增量文本通过队列交给事件循环"""
+    name = "DashScope"
+
+    def __init__(self, model: str, api_key: Optional[str]):
+        if not api_key:
+            raise ValueError("❌ 未找到 API Key，请在 .env 文件中设置 DASHSCOPE_API_KEY")
+        import dashscope
+        dashscope.api_key = api_key
+        self.model = model
+        self._generation = dashscope.Generation
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """调用方提前停止读取时，后台线程在下一段输出到达时结束"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                responses = self._generation.call(
+                    model=self.model,
+                    messages=messages,
+                    result_format="message",
+                    stream=True,
+                    incremental_output=True
+                )
+                for response in responses:
+                    if stop.is_set():
+                        break
+                    if response.status_code != 200:
+                        raise RuntimeError(f"DashScope API 失败: {response.message}")
+                    loop.call_soon_threadsafe(queue.put_nowait, response.output.choices[0].message.content or "")
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        loop.run_in_executor(None, produce)
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI 兼容接口（OpenAI、vLLM、Ollama、DashScope 兼容模式等），使用异步客户端"""
+    name = "OpenAI"
+
+    def __init__(self, model: str, api_key: Optional[str], base_url: Optional[str] = None):
+        if not api_key:
+            raise ValueError("❌ 未找到 API Key，请在 .env 文件中设置 OPENAI_API_KEY")
+        from openai import AsyncOpenAI
+        self.model = model
+        self._client = AsyncOpenAI(api_key=api_key, base_url=base_url or None)
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        response = await self._client.chat.completions.create(model=self.model, messages=messages, stream=True)
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+def request_key(messages: Messages) -> str:
+    """请求的精确回放键：消息列表规范化后的哈希"""
+    payload = json.dumps(messages, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def turn_key(messages: Messages) -> str:
+    """请求的宽松回放键：用户的原始问题加上当前是第几轮
+
+    工具结果里常带有时间、进程号等每次都不同的内容，精确键匹配不上时按这个键回放，
+    保证多步工具调用的流程可以复现。
+    """
+    query = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    turn = sum(1 for m in messages if m.get("role") == "assistant")
+    return request_key([{"role": "user", "content": query}, {"role": "turn", "content": str(turn)}])
+
+class RecordingProvider(LLMProvider):
+    """包装真实的模型接口，把每次完整生成的分段输出和耗时追加到 JSONL 记录文件，供回放使用"""
+
+    def __init__(self, inner: LLMProvider, record_file: str):
+        self.inner = inner
+        self.name = inner.name
+        self.record_file = record_file
+        self._lock = asyncio.Lock()
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        started = time.perf_counter()
+        chunks: List[str] = []
+        delays: List[float] = []
+        last = started
+        complete = False
+        try:
+            async for chunk in self.inner.stream(messages):
+                now = time.perf_counter()
+                chunks.append(chunk)
+                delays.append(round((now - last) * 1000, 1))
+                last = now
+                yield chunk
+            complete = True
+        finally:
+            # 调用方提前停止读取（如已拿到完整的工具调用）时，记录的是到当时为止的输出，回放行为一致
+            record = {
+                "key": request_key(messages),
+                "turn_key": turn_key(messages),
+                "chunks": chunks,
+                "delays_ms": delays,
+                "complete": complete,
+                "messages": messages
+            }
+            async with self._lock:
+                with open(self.record_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+class ReplayProvider(LLMProvider):
+    """从记录文件回放模型输出，不访问网络，结果可复现
+
+    first_token_ms / chunk_ms 为合成延迟：首段输出前和之后每段之间的等待时间；
+    设为负数时使用录制时的真实间隔。
+    """
+    name = "Replay"
+
+    def __init__(self, replay_file: str, first_token_ms: float = 0, chunk_ms: float = 0):
+        self.first_token_ms = first_token_ms
+        self.chunk_ms = chunk_ms
+        self.records: Dict[str, dict] = {}
+        self.turn_records: Dict[str, dict] = {}
+        with open(replay_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    self.records[record["key"]] = record
+                    self.turn_records[record["turn_key"]] = record
+        logger.info(f"Loaded {len(self.records)} recorded completions from {replay_file}")
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        record = self.records.get(request_key(messages)) or self.turn_records.get(turn_key(messages))
+        if record is None:
+            raise RuntimeError("回放记录中没有与该请求匹配的模型输出")
+        for index, chunk in enumerate(record["chunks"]):
+            delay = self.first_token_ms if index == 0 else self.chunk_ms
+            if delay < 0:
+                delay = record["delays_ms"][index]
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            yield chunk
+
+def create_provider() -> LLMProvider:
+    """根据环境变量创建模型接口：LLM_PROVIDER 选择 dashscope / openai / replay，设置 LLM_RECORD_FILE 时录制输出"""
+    provider_name = os.getenv("LLM_PROVIDER", "dashscope").lower()
+    model = os.getenv("MODEL") or "qwen-max"
+    if provider_name == "replay":
+        replay_file = os.getenv("LLM_REPLAY_FILE")
+        if not replay_file:
+            raise ValueError("❌ 回放模式需要在 .env 文件中设置 LLM_REPLAY_FILE")
+        return ReplayProvider(
+            replay_file,
+            float(os.getenv("REPLAY_FIRST_TOKEN_MS", "0")),
+            float(os.getenv("REPLAY_CHUNK_MS", "0"))
+        )
+    if provider_name == "openai":
+        provider: LLMProvider = OpenAIProvider(model, os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+    elif provider_name == "dashscope":
+        provider = DashScopeProvider(model, os.getenv("DASHSCOPE_API_KEY"))
+    else:
+        raise ValueError(f"❌ 不支持的 LLM_PROVIDER: {provider_name}")
+
+    record_file = os.getenv("LLM_RECORD_FILE")
+    if record_file:
+        provider = RecordingProvider(provider, record_file)
+    return provider
@@ -1,16 +1,21 @@
+import argparse
 import asyncio
 import os
 import json
+import hashlib
 import sys
 import platform
 import logging
+import time
 from pathlib import Path
-from typing import Optional, List
-from contextlib import AsyncExitStack
-from dashscope import Generation
+from typing import Any, Callable, Dict, Iterator, Optional, List, Set, Tuple, Union
+from contextlib import AsyncExitStack, aclosing
 from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from llm_providers import LLMProvider, create_provider
+from plan_cache import PlanCache
+from direct_session import DirectSession
 
 # 配置日志
 logging.basicConfig(
@@ -22,6 +27,24 @@ logger = logging.getLogger("MCPClient")
 # 加载环境变量
 load_dotenv()
 
+# 直连模式读取的服务器配置和后端脚本目录，默认与代理服务端相同
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+CONFIG_FILE = os.getenv("CONFIG_FILE", str(PROJECT_ROOT / "servers.json"))
+SERVERS_DIR = os.getenv("SERVERS_DIR", str(PROJECT_ROOT / "servers"))
+BACKEND_STARTUP_TIMEOUT = float(os.getenv("BACKEND_STARTUP_TIMEOUT", "60"))
+# 代理服务端自身的管理工具，不提供给模型选择
+PROXY_ADMIN_TOOLS = {"proxy_tool_call", "proxy_batch_call", "proxy_status", "proxy_stats", "proxy_reload"}
+# 多步工具调用：单次查询最多的模型轮数、整体截止时间（秒），以及回传给模型的单个工具结果最大长度
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "5"))
+AGENT_DEADLINE = float(os.getenv("AGENT_DEADLINE", "120"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))
+# 工具调用计划缓存：TTL（秒，0 表示关闭）、条目数上限、持久化文件（为空则只在内存中）和相似度阈值
+# （默认 1 只匹配规范化后相同的查询；小于 1 时相似查询会原样复用缓存的工具参数，可能返回另一个问题的结果）
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "256"))
+PLAN_CACHE_FILE = os.getenv("PLAN_CACHE_FILE", "")
+PLAN_CACHE_SIMILARITY = float(os.getenv("PLAN_CACHE_SIMILARITY", "1.0"))
+
 def normalize_path(path: str) -> str:
     """标准化路径，确保跨平台兼容性"""
     return str(Path(path).resolve())
@@ -38,19 +61,154 @@ def get_node_command() -> str:
         return "node"
     return "node"
 
-class MCPClient:
-    def __init__(self):
-        """初始化 MCP 客户端"""
-        self.exit_stack = AsyncExitStack()
-        self.api_key = os.getenv("DASHSCOPE_API_KEY")
-        self.model = os.getenv("MODEL") or "qwen-max"
+def describe_tool(tool) -> str:
+    """生成工具在系统提示词中的一行描述，参数只保留名称和类型以压缩提示词长度"""
+    properties = tool.inputSchema.get("properties", {})
+    params = ", ".join(f"{name}: {schema.get('type', 'any')}" for name, schema in properties.items())
+    description = " ".join((tool.description or "").split())
+    return f"- {tool.name}({params}): {description}"
+
+def format_tool_result(result) -> str:
+    """拼接工具结果中的文本内容，图片等非文本内容以类型占位"""
+    text = "\n".join(
+        item.text if item.type == "text" else f"[{item.type}]"
+        for item in result.content
+    )
+    return f"⚠️ {text}" if result.isError and not text.startswith("⚠️") else text
+
+def parse_tool_calls(tool_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """从模型输出的 JSON 中取出工具调用列表，支持单个调用和一次多个调用两种格式"""
+    if tool_data.get("action") == "call_tool":
+        return [{"tool": tool_data.get("tool"), "args": tool_data.get("args", {})}]
+    if tool_data.get("action") == "call_tools":
+        return [call for call in tool_data.get("calls", []) if isinstance(call, dict)]
+    return []
+
+def render_tool_results(calls: List[Dict[str, Any]], results: List[str]) -> str:
+    """把本轮工具结果整理成回传给模型的消息"""
+    lines = ["工具调用结果："]
+    for call, result in zip(calls, results):
+        if len(result) > TOOL_RESULT_MAX_CHARS:
+            result = result[:TOOL_RESULT_MAX_CHARS] + "...（已截断）"
+        lines.append(f"- {call.get('tool')}({json.dumps(call.get('args', {}), ensure_ascii=False)}): {result}")
+    lines.append("请根据以上结果继续：需要更多信息时再调用工具，否则直接给出最终回答。")
+    return "\n".join(lines)
+
+def read_batch_lines(source: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取批处理输入，生成 {"id", "query"}；没有 id 的行以行号作为 id，空行跳过"""
+    f = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                data = line
+            if isinstance(data, dict):
+                query_id = data.get("id", data.get("request_id", line_no))
+                query = data.get("query") or data.get("body") or data.get("title") or ""
+            else:
+                query_id, query = line_no, str(data)
+            yield {"id": query_id, "query": query}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def load_completed_ids(output: str) -> Set[Any]:
+    """读取已有的批处理结果，返回已成功处理的 id，用于续跑"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时最后一行可能只写了一半
+                continue
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+class StreamingResponse:
+    """累积模型的流式输出：工具调用 JSON 一完整就能取出，其余文本可以边生成边显示"""
+    TOOL_FENCE = "```json"
 
-        if not self.api_key:
-            raise ValueError("❌ 未找到 API Key，请在 .env 文件中设置 DASHSCOPE_API_KEY")
+    def __init__(self):
+        self.text = ""
+        self.emitted = 0
+        # 从这个位置开始查找工具调用代码块，之前的 JSON 代码块已确认不是工具调用
+        self.search_from = 0
+        self._decoder = json.JSONDecoder()
+
+    def find_fence(self) -> int:
+        """尚未确认的 ```json 代码块的起始位置，没有时返回 -1"""
+        return self.text.find(self.TOOL_FENCE, self.search_from)
+
+    def feed(self, delta: str) -> str:
+        """追加一段输出，返回可以显示给用户的新文本；工具调用代码块及其可能的前缀不会被显示"""
+        self.text += delta
+        safe_end = self.find_fence()
+        if safe_end < 0:
+            safe_end = len(self.text)
+            for size in range(min(len(self.TOOL_FENCE) - 1, len(self.text)), 0, -1):
+                if self.text.endswith(self.TOOL_FENCE[:size]):
+                    safe_end -= size
+                    break
+        if safe_end <= self.emitted:
+            return ""
+        visible = self.text[self.emitted:safe_end]
+        self.emitted = safe_end
+        return visible
+
+    def flush(self) -> str:
+        """输出结束时返回尚未显示的结尾文本，工具调用代码块仍然不显示"""
+        end = self.find_fence()
+        end = len(self.text) if end < 0 else end
+        visible = self.text[self.emitted:end] if end > self.emitted else ""
+        self.emitted = max(self.emitted, end)
+        return visible
+
+    def tool_call(self) -> Optional[Dict[str, Any]]:
+        """```json 之后的工具调用 JSON 已完整时返回它，不必等待结尾的 ``` 和后续输出
+
+        完整但不是工具调用的 JSON（例如回答中的示例）会被放行，之后随其余文本一起显示。
+        """
+        while True:
+            fence = self.find_fence()
+            if fence < 0:
+                return None
+            body = self.text[fence + len(self.TOOL_FENCE):].lstrip()
+            try:
+                data, _ = self._decoder.raw_decode(body)
+            except json.JSONDecodeError:
+                return None
+            if isinstance(data, dict) and parse_tool_calls(data):
+                return data
+            self.search_from = fence + len(self.TOOL_FENCE)
 
-        import dashscope
-        dashscope.api_key = self.api_key
-        self.session: Optional[ClientSession] = None
+class MCPClient:
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        """初始化 MCP 客户端，未指定模型接口时按环境变量 LLM_PROVIDER 创建"""
+        self.exit_stack = AsyncExitStack()
+        self.provider = provider or create_provider()
+        # 相同或相近的查询直接复用模型上次选择的工具调用，跳过模型调用
+        self.plan_cache: Optional[PlanCache] = None
+        if PLAN_CACHE_TTL > 0:
+            self.plan_cache = PlanCache(
+                PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_TTL, PLAN_CACHE_SIMILARITY, PLAN_CACHE_FILE or None
+            )
+        # 连接代理（或单个服务端）时为 ClientSession，直连模式下为 DirectSession
+        self.session: Optional[Union[ClientSession, DirectSession]] = None
+        # 工具目录和渲染好的系统提示词缓存，收到 tools/list_changed 通知后才重新获取
+        self.tools: List[types.Tool] = []
+        self.tools_hash: Optional[str] = None
+        self.tools_stale = True
+        self.system_prompt: Optional[str] = None
+        # 最近一次查询的首个 token 时间（TTFT）、首个动作时间（TTFA）和总耗时，单位毫秒
+        self.last_timings: Dict[str, Optional[float]] = {}
 
     async def connect_to_server(self, server_script_path: str):
         """连接到 MCP 服务器并列出可用工具"""
@@ -80,113 +238,246 @@ class MCPClient:
             # 建立连接
             stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
             self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+            self.session = await self.exit_stack.enter_async_context(
+                ClientSession(self.stdio, self.write, message_handler=self.handle_message)
+            )
             await self.session.initialize()
 
-            # 获取可用工具
-            available_tools = [
-                {"name": "query_weather", "description": "查询指定城市代码的天气信息", "inputSchema": {"city_code": "string"}},
-                {"name": "google_search", "description": "使用谷歌搜索关键词", "inputSchema": {"query": "string"}},
-                {"name": "capture_camera_image", "description": "拍照并进行微表情分析", "inputSchema": {}},
-                {"name": "generate_image", "description": "生成图片", "inputSchema": {}}
-            ]
-            logger.info(f"已连接到服务器，支持以下工具: {[tool['name'] for tool in available_tools]}")
+            # 获取可用工具，代理服务端会以真实名称和参数结构暴露所有后端工具
+            available_tools = await self.get_available_tools()
+            logger.info(f"已连接到服务器，支持以下工具: {available_tools}")
 
         except Exception as e:
             logger.error(f"连接服务器失败: {str(e)}")
             raise
 
+    async def connect_direct(self, config_file: str = CONFIG_FILE, servers_dir: str = SERVERS_DIR):
+        """直连模式：按 servers.json 在进程内连接所有后端，工具调用直接发给后端，不经过代理"""
+        try:
+            self.session = await self.exit_stack.enter_async_context(
+                DirectSession(config_file, servers_dir, self.handle_message, BACKEND_STARTUP_TIMEOUT)
+            )
+            available_tools = await self.get_available_tools()
+            logger.info(f"已直连 {len(self.session.backends)} 个后端，支持以下工具: {available_tools}")
+        except Exception as e:
+            logger.error(f"直连后端失败: {str(e)}")
+            raise
+
+    async def handle_message(self, message):
+        """处理服务端推送的消息，工具列表变化时标记缓存过期"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info("服务端工具列表已变化")
+            self.tools_stale = True
+
+    async def get_tools(self) -> List[types.Tool]:
+        """获取工具目录，缓存有效时不再请求服务端；内容哈希变化时才重新渲染系统提示词"""
+        if self.tools_stale:
+            # 先清除标记，请求期间收到的变化通知会让下一次查询再次刷新
+            self.tools_stale = False
+            try:
+                response = await self.session.list_tools()
+            except Exception:
+                self.tools_stale = True
+                raise
+            tools_hash = hashlib.sha256(json.dumps(
+                [tool.model_dump(mode="json", exclude_none=True) for tool in response.tools],
+                sort_keys=True
+            ).encode("utf-8")).hexdigest()
+            if tools_hash != self.tools_hash:
+                self.tools = response.tools
+                self.tools_hash = tools_hash
+                self.system_prompt = None
+        return self.tools
+
     async def get_available_tools(self) -> List[str]:
         """获取当前可用的工具列表"""
         if not self.session:
             logger.warning("未连接到服务器")
             return []
         try:
-            response = await self.session.list_tools()
-            return [tool.name for tool in response.tools]
+            return [tool.name for tool in await self.get_tools()]
         except Exception as e:
             logger.error(f"获取工具列表失败: {str(e)}")
             return []
 
-    async def process_query(self, query: str) -> str:
-        """使用 DashScope 处理查询，通过代理服务端调用工具"""
-        if not self.session:
-            return "⚠️ 未连接到服务器"
-
-        try:
-            response = await self.session.list_tools()
-            tool_descriptions = "\n".join(
-                f"- {tool.name}: {tool.description} (输入参数: {json.dumps(tool.inputSchema)})"
-                for tool in response.tools
-            )
-
-            system_prompt = f"""
-                你是一个智能助手，可以根据用户输入决定是否调用工具。当前通过代理服务端支持以下底层工具：
-                - query_weather: 查询指定城市代码的天气信息，输入参数为城市代码（如 '110000' 表示北京，'330100' 表示杭州）
-                - google_search: 使用 google_search 工具，参数名必须是 query，打开本地谷歌浏览器并搜索指定关键词，输入参数为搜索关键词（如 'Python tutorial'）。
-                - capture_camera_image：使用 capture_camera_image 工具，拍照并进行微表情分析。
-                - generate_image：使用 generate_image 工具来进行生图。
-
-                代理服务端工具：
+    async def get_system_prompt(self) -> str:
+        """返回缓存的系统提示词，工具目录变化后重新渲染"""
+        tools = await self.get_tools()
+        if self.system_prompt is None:
+            self.system_prompt = self.render_system_prompt(tools)
+        return self.system_prompt
+
+    @staticmethod
+    def render_system_prompt(tools: List[types.Tool]) -> str:
+        """根据工具目录渲染系统提示词"""
+        tool_descriptions = "\n".join(
+            describe_tool(tool) for tool in tools
+            if tool.name not in PROXY_ADMIN_TOOLS
+        )
+
+        return f"""
+                你是一个智能助手，可以根据用户输入决定是否调用工具。当前支持以下工具：
                 {tool_descriptions}
 
                 你的任务是：
                 1. 理解用户的问题。
-                2. 如果需要调用工具，返回 JSON 格式的响应，包含：
-                   - "action": "call_tool"
-                   - "tool": 底层工具名称（如 'query_weather' 或 'google_search'）
-                   - "args": 工具参数（字典格式）
-                3. 如果不需要工具，直接返回纯文本回答。
+                2. 如果需要调用工具，返回 JSON 格式的响应：
+                   - 调用一个工具："action" 为 "call_tool"，"tool" 为工具名称（如 'query_weather' 或 'google_search'），"args" 为工具参数（字典格式）
+                   - 同时调用多个互不依赖的工具："action" 为 "call_tools"，"calls" 为调用列表，这些调用会并发执行
+                3. 工具结果会返回给你，你可以继续调用工具（依赖上一步结果的调用放到下一轮），信息足够时直接返回纯文本的最终回答。
+                4. 如果不需要工具，直接返回纯文本回答。
 
                 请以以下格式返回：
                 - 工具调用: ```json\n{{"action": "call_tool", "tool": "tool_name", "args": {{...}}}}\n```
+                - 多个工具调用: ```json\n{{"action": "call_tools", "calls": [{{"tool": "tool_name", "args": {{...}}}}, ...]}}\n```
                 - 普通回答: 直接返回文本
 
                 注意：
                 - 如果用户提到城市天气，请将城市名转换为高德地图城市代码（例如"北京" -> "110000"，"杭州" -> "330100"）。
-                - 代理服务端会将请求转发到正确的工具，你只需指定底层工具名和参数。
+                - 工具参数名必须与上面列出的输入参数一致。
             """
+
+    async def call_tool(self, tool_name: Optional[str], tool_args: Dict[str, Any]) -> str:
+        """调用单个工具并返回文本结果，失败时返回错误信息而不是抛出异常，不影响同一轮的其他调用"""
+        if not tool_name:
+            return "⚠️ 工具名称缺失"
+        try:
+            result = await self.session.call_tool(tool_name, tool_args or {})
+            return format_tool_result(result)
+        except Exception as e:
+            logger.error(f"调用工具 {tool_name} 失败: {str(e)}")
+            return f"⚠️ 工具调用失败: {str(e)}"
+
+    async def run_tool_calls(self, calls: List[Dict[str, Any]], timings: Optional[Dict[str, Any]] = None) -> List[str]:
+        """并发执行一轮互不依赖的工具调用，耗时取决于最慢的那个，累计到 timings 的 tool_ms"""
+        started = time.perf_counter()
+        results = list(await asyncio.gather(
+            *(self.call_tool(call.get("tool"), call.get("args", {})) for call in calls)
+        ))
+        if timings is not None:
+            timings["tool_ms"] = round(timings.get("tool_ms", 0) + (time.perf_counter() - started) * 1000, 1)
+        return results
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        on_token: Optional[Callable[[str], None]],
+        on_first_token: Callable[[], None]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """流式生成一轮回复，返回已生成的文本和工具调用 JSON；工具调用一完整就停止读取"""
+        stream = StreamingResponse()
+        tool_data = None
+        async with aclosing(self.provider.stream(messages)) as deltas:
+            async for delta in deltas:
+                if delta:
+                    on_first_token()
+                visible = stream.feed(delta)
+                tool_data = stream.tool_call()
+                if tool_data is not None:
+                    if visible and on_token:
+                        on_token(visible)
+                    # 工具调用已完整，不再等待模型后续的输出
+                    break
+                # 不是工具调用的 JSON 代码块在 tool_call() 中被放行，与新文本一起显示
+                visible += stream.feed("")
+                if visible and on_token:
+                    on_token(visible)
+
+        if tool_data is None:
+            rest = stream.flush()
+            if rest and on_token:
+                on_token(rest)
+            if stream.find_fence() >= 0:
+                logger.error(f"JSON 解析失败: {stream.text}")
+        return stream.text, tool_data
+
+    async def process_query(
+        self,
+        query: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        timings: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """流式调用大模型处理查询：每轮并发执行模型给出的工具调用并把结果回传给模型，直到得到最终回答
+
+        受 AGENT_MAX_STEPS 轮数和 AGENT_DEADLINE 截止时间限制，普通回答通过 on_token 逐段输出。
+        耗时统计写入 timings（并发查询时由调用方各自传入），同时保存在 last_timings。
+        """
+        if not self.session:
+            return "⚠️ 未连接到服务器"
+
+        started = time.perf_counter()
+        timings = timings if timings is not None else {}
+        timings.update({
+            "ttft_ms": None, "ttfa_ms": None, "total_ms": None, "tool_ms": 0, "steps": 0, "tool_calls": 0,
+            "plan_cache": None
+        })
+        self.last_timings = timings
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - started) * 1000, 1)
+
+        def mark_first_token():
+            if timings["ttft_ms"] is None:
+                timings["ttft_ms"] = elapsed_ms()
+
+        last_results: List[str] = []
+        try:
+            system_prompt = await self.get_system_prompt()
             messages = [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": query}
             ]
 
-            response = await asyncio.to_thread(
-                Generation.call,
-                model=self.model,
-                messages=messages,
-                result_format="message"
-            )
-
-            if response.status_code != 200:
-                logger.error(f"DashScope API 失败: {response.message}")
-                return f"⚠️ DashScope API 失败: {response.message}"
-
-            content = response.output.choices[0].message.content
-            try:
-                if "```json" in content:
-                    json_str = content.split("```json")[1].split("```")[0].strip()
-                    tool_data = json.loads(json_str)
-                    if tool_data.get("action") == "call_tool":
-                        tool_name = tool_data.get("tool")
-                        tool_args = tool_data.get("args", {})
-
-                        if not tool_name:
-                            return "⚠️ 工具名称缺失"
-
-                        proxy_params = {
-                            "params": {"tool": tool_name, "args": tool_args}
-                        }
-                        result = await self.session.call_tool("proxy_tool_call", proxy_params)
-                        return result.content[0].text
-                return content
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON 解析失败: {str(e)}")
-                return content
-
+            async with asyncio.timeout(AGENT_DEADLINE):
+                planned = self.plan_cache.get(query) if self.plan_cache else None
+                if planned is not None:
+                    tool_names = {tool.name for tool in self.tools}
+                    if all(call.get("tool") in tool_names for call in planned):
+                        timings["plan_cache"] = "hit"
+                        timings["ttfa_ms"] = elapsed_ms()
+                        timings["tool_calls"] = len(planned)
+                        # 命中时不调用模型，返回的是工具的原始结果，而不是模型整理后的回答
+                        return "\n".join(await self.run_tool_calls(planned, timings))
+                    # 计划中的工具已经下线，重新询问模型
+                    self.plan_cache.discard(query)
+                if self.plan_cache:
+                    timings["plan_cache"] = "miss"
+
+                first_calls: List[Dict[str, Any]] = []
+                for step in range(AGENT_MAX_STEPS):
+                    timings["steps"] = step + 1
+                    content, tool_data = await self.generate(messages, on_token, mark_first_token)
+                    calls = parse_tool_calls(tool_data) if tool_data is not None else []
+                    if not calls:
+                        # 只有一轮工具调用且全部成功的计划与中间结果无关，可以缓存复用
+                        if self.plan_cache and step == 1 and not any(r.startswith("⚠️") for r in last_results):
+                            self.plan_cache.put(query, first_calls)
+                        return content
+
+                    if timings["ttfa_ms"] is None:
+                        timings["ttfa_ms"] = elapsed_ms()
+                    if step == 0:
+                        first_calls = calls
+                    last_results = await self.run_tool_calls(calls, timings)
+                    timings["tool_calls"] += len(calls)
+                    messages.append({"role": "assistant", "content": content})
+                    messages.append({"role": "user", "content": render_tool_results(calls, last_results)})
+
+            logger.warning(f"查询达到最大步数 {AGENT_MAX_STEPS}，返回最近一轮的工具结果")
+            return "\n".join(last_results)
+
+        except TimeoutError:
+            logger.warning(f"查询超过截止时间 {AGENT_DEADLINE}s")
+            return "\n".join([f"⚠️ 查询超过截止时间（{AGENT_DEADLINE:.0f}s）"] + last_results)
         except Exception as e:
             logger.error(f"处理查询时出错: {str(e)}")
             return f"⚠️ 处理查询时出错: {str(e)}"
+        finally:
+            timings["total_ms"] = elapsed_ms()
+            logger.info(
+                f"查询耗时: TTFT {timings['ttft_ms']}ms, TTFA {timings['ttfa_ms']}ms, 总计 {timings['total_ms']}ms, "
+                f"工具 {timings['tool_ms']}ms, {timings['steps']} 轮, {timings['tool_calls']} 次工具调用"
+            )
 
     async def chat_loop(self):
         """运行交互式聊天循环"""
@@ -194,15 +485,97 @@ class MCPClient:
         print("示例：'北京的天气怎么样？' 或 '在谷歌上搜索 Python 教程'")
         while True:
             try:
-                query = input("\n你: ").strip()
+                # 在线程中等待输入，避免阻塞事件循环处理服务端通知
+                query = (await asyncio.to_thread(input, "\n你: ")).strip()
                 if query.lower() == 'quit':
                     break
-                response = await self.process_query(query)
-                print(f"\n🤖 DashScope: {response}")
+                print(f"\n🤖 {self.provider.name}: ", end="", flush=True)
+                streamed = []
+
+                def show_token(text: str):
+                    streamed.append(text)
+                    print(text, end="", flush=True)
+
+                response = await self.process_query(query, on_token=show_token)
+                # 最终回答已经流式输出过时只换行，否则（工具结果、错误等）再输出一次
+                if "".join(streamed).endswith(response):
+                    print()
+                else:
+                    print(("\n" if streamed else "") + response)
             except Exception as e:
                 logger.error(f"聊天循环出错: {str(e)}")
                 print(f"\n⚠️ 发生错误: {str(e)}")
 
+    async def run_batch(self, source: str, output: Optional[str], concurrency: int = 4, resume: bool = False):
+        """非交互批处理：从 JSONL 文件或标准输入（source 为 "-"）流式读取查询，在同一个会话上并发处理
+
+        每行可以是 {"id": ..., "query": ...}，也可以是纯文本查询；结果按完成顺序逐行写入 output（默认标准输出），
+        包含耗时和状态。resume 为 True 时跳过 output 中已经成功处理的 id，并在文件末尾追加。
+        """
+        done = load_completed_ids(output) if resume and output else set()
+        if done:
+            logger.info(f"续跑：跳过 {len(done)} 条已完成的查询")
+
+        out = open(output, "a" if resume else "w", encoding="utf-8") if output else sys.stdout
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        latencies: List[float] = []
+        counts = {"ok": 0, "error": 0, "skipped": 0}
+        started = time.perf_counter()
+
+        async def produce():
+            lines = read_batch_lines(source)
+            while True:
+                # 标准输入可能阻塞，放到线程中读取
+                item = await asyncio.to_thread(next, lines, None)
+                if item is None:
+                    break
+                if item["id"] in done:
+                    counts["skipped"] += 1
+                    continue
+                await queue.put(item)
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def work():
+            while (item := await queue.get()) is not None:
+                timings: Dict[str, Any] = {}
+                query_started = time.perf_counter()
+                response = await self.process_query(item["query"], timings=timings)
+                latency_ms = round((time.perf_counter() - query_started) * 1000, 1)
+                status = "error" if response.startswith("⚠️") else "ok"
+                counts[status] += 1
+                latencies.append(latency_ms)
+                record = {
+                    "id": item["id"],
+                    "query": item["query"],
+                    "status": status,
+                    "response": response,
+                    "latency_ms": latency_ms,
+                    "ttft_ms": timings.get("ttft_ms"),
+                    "ttfa_ms": timings.get("ttfa_ms"),
+                    "tool_ms": timings.get("tool_ms"),
+                    "steps": timings.get("steps"),
+                    "tool_calls": timings.get("tool_calls"),
+                    "plan_cache": timings.get("plan_cache")
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+        try:
+            await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        elapsed = time.perf_counter() - started
+        processed = counts["ok"] + counts["error"]
+        latencies.sort()
+        logger.info(
+            f"批处理完成: {processed} 条（成功 {counts['ok']}，失败 {counts['error']}，跳过 {counts['skipped']}），"
+            f"耗时 {elapsed:.1f}s，吞吐 {processed / elapsed if elapsed else 0:.2f} 条/秒，"
+            f"p50 {latencies[len(latencies) // 2] if latencies else 0}ms"
+        )
+
     async def cleanup(self):
         """清理资源"""
         try:
@@ -212,14 +585,27 @@ class MCPClient:
 
 async def main():
     """主函数"""
-    if len(sys.argv) < 2:
-        print("Usage: python mcp_client.py <path_to_server_script>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="MCP 客户端")
+    parser.add_argument("server_script", nargs="?", help="服务器脚本路径，通常是 proxy/proxy_server.py")
+    parser.add_argument("--direct", action="store_true", help="直连模式：读取 servers.json 直接连接所有后端，不经过代理")
+    parser.add_argument("--batch", metavar="FILE", help="批处理模式：从 JSONL 文件读取查询，- 表示标准输入")
+    parser.add_argument("--output", help="批处理结果的 JSONL 文件，默认输出到标准输出")
+    parser.add_argument("--concurrency", type=int, default=4, help="批处理的并发查询数")
+    parser.add_argument("--resume", action="store_true", help="跳过 --output 中已成功处理的查询并追加结果")
+    args = parser.parse_args()
+    if not args.direct and not args.server_script:
+        parser.error("需要指定服务器脚本路径，或使用 --direct 直连模式")
 
     client = MCPClient()
     try:
-        await client.connect_to_server(sys.argv[1])
-        await client.chat_loop()
+        if args.direct:
+            await client.connect_direct()
+        else:
+            await client.connect_to_server(args.server_script)
+        if args.batch:
+            await client.run_batch(args.batch, args.output, max(1, args.concurrency), args.resume)
+        else:
+            await client.chat_loop()
     except Exception as e:
         logger.error(f"程序运行出错: {str(e)}")
     finally:
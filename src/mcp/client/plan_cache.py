@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("PlanCache")
+
+# 规范化时去掉的标点和空白（包括中文标点）
+PUNCTUATION = re.compile(r"[\s\.,!?;:'\"`~，。！？；：、“”‘’（）()\[\]【】《》<>…—-]+")
+
+def normalize_query(query: str) -> str:
+    """规范化查询：全角转半角、转小写、去掉标点和空白"""
+    return PUNCTUATION.sub("", unicodedata.normalize("NFKC", query).lower())
+
+class PlanCache:
+    """工具调用计划缓存：规范化后的查询 -> 模型选择的工具调用，按 TTL 过期、按 LRU 淘汰，可持久化到磁盘
+
+    similarity 小于 1 时，没有完全相同的查询也会匹配相似度（difflib ratio）不低于该值的最相近查询。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 600,
+        similarity: float = 1.0,
+        persist_file: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.persist_file = persist_file
+        # 规范化查询 -> {"calls": [...], "expires_at": 时间戳}，过期时间用墙上时间以便持久化
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if persist_file:
+            self._load()
+
+    def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """查找缓存的工具调用计划，命中时移到 LRU 队尾"""
+        key = self._match(normalize_query(query))
+        if key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]["calls"]
+
+    def put(self, query: str, calls: List[Dict[str, Any]]):
+        """记录查询对应的工具调用计划，超出容量时淘汰最久未使用的条目"""
+        key = normalize_query(query)
+        if not key:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = {"calls": calls, "expires_at": time.time() + self.ttl}
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._save()
+
+    def discard(self, query: str):
+        """删除查询对应的计划（例如计划中的工具已不存在）"""
+        key = self._match(normalize_query(query))
+        if key is not None:
+            del self._entries[key]
+            self._save()
+
+    def _match(self, key: str) -> Optional[str]:
+        now = time.time()
+        for expired in [k for k, entry in self._entries.items() if entry["expires_at"] <= now]:
+            del self._entries[expired]
+        if key in self._entries:
+            return key
+        if self.similarity >= 1 or not key:
+            return None
+        best, best_ratio = None, self.similarity
+        for candidate in self._entries:
+            matcher = SequenceMatcher(None, key, candidate)
+            # quick_ratio 是 ratio 的上界，先用它快速排除不可能达到阈值的候选
+            if matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+
+    def _load(self):
+        if not os.path.exists(self.persist_file):
+            return
+        try:
+            with open(self.persist_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            for key, entry in entries.items():
+                if entry.get("expires_at", 0) > now and isinstance(entry.get("calls"), list):
+                    self._entries[key] = entry
+            logger.info(f"已加载 {len(self._entries)} 条工具调用计划缓存")
+        except Exception as e:
+            logger.warning(f"加载计划缓存失败: {str(e)}")
+
+    def _save(self):
+        if not self.persist_file:
+            return
+        try:
+            tmp_file = f"{self.persist_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.persist_file)
+        except OSError as e:
+            logger.warning(f"保存计划缓存失败: {str(e)}")
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
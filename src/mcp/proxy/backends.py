@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import os
+import platform
+import time
+import anyio
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from metrics import ProxyMetrics
+
+# 后端配置解析与后端进程连接，代理和客户端直连模式共用，导入时不读取环境变量、没有副作用
+logger = logging.getLogger("Backend")
+
+def normalize_path(path: str) -> str:
+    """标准化路径，确保跨平台兼容性"""
+    return str(Path(path).resolve())
+
+def get_python_command() -> str:
+    """获取 Python 命令，考虑不同平台"""
+    if platform.system() == "Windows":
+        return "python"
+    return "python3"
+
+def get_node_command() -> str:
+    """获取 Node.js 命令，考虑不同平台"""
+    if platform.system() == "Windows":
+        return "node"
+    return "node"
+
+def read_server_config(config_file: str) -> list:
+    """读取并验证服务器配置，配置有误时抛出异常"""
+    with open(normalize_path(config_file), 'r', encoding='utf-8') as f:
+        servers = json.load(f)
+
+    if not isinstance(servers, list):
+        raise ValueError("Config file must contain a list of server configurations")
+
+    # 验证每个服务器配置
+    for server in servers:
+        if not isinstance(server, dict):
+            raise ValueError("Each server configuration must be a dictionary")
+        if "name" not in server or "script" not in server:
+            raise ValueError("Each server configuration must have 'name' and 'script' fields")
+        replicas = server.get("replicas", 1)
+        if not isinstance(replicas, int) or replicas < 1:
+            raise ValueError(f"'replicas' of {server['name']} must be a positive integer")
+        if not isinstance(server.get("cache", {}), dict):
+            raise ValueError(f"'cache' of {server['name']} must be a dictionary of tool cache settings")
+        if not isinstance(server.get("tool_concurrency", {}), dict):
+            raise ValueError(f"'tool_concurrency' of {server['name']} must be a dictionary of tool limits")
+
+    names = [server["name"] for server in servers]
+    if len(names) != len(set(names)):
+        raise ValueError("Server names must be unique")
+    return servers
+
+# 后端进程退出后，对其 stdio 流的读写会抛出这些异常
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+# 进度回调：接收后端上报的 (progress, total)，转发给调用方
+ProgressCallback = Callable[[float, Optional[float]], Awaitable[None]]
+# 后端推送消息的处理函数
+MessageHandler = Callable[[Any], Awaitable[None]]
+
+def build_server_params(server: dict, servers_dir: str) -> StdioServerParameters:
+    """根据服务器配置构建 stdio 启动参数"""
+    script_name = server["script"]
+
+    script_path = normalize_path(os.path.join(servers_dir, script_name))
+    if not os.path.exists(script_path):
+        raise FileNotFoundError(f"Server script not found: {script_path}")
+
+    # 确保脚本有执行权限
+    if platform.system() != "Windows":
+        os.chmod(script_path, 0o755)
+
+    # 根据脚本扩展名确定命令
+    is_python = script_name.endswith('.py')
+    is_js = script_name.endswith('.js')
+
+    if not (is_python or is_js):
+        raise ValueError(f"Unsupported script type: {script_name}")
+
+    command = get_python_command() if is_python else get_node_command()
+    return StdioServerParameters(
+        command=command,
+        args=[script_path],
+        env=None
+    )
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，打开期间调用直接失败，冷却结束后进入半开状态，每次只放行一个试探请求"""
+
+    def __init__(self, threshold: int = 3, reset_timeout: float = 30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        # 半开状态下是否已有试探请求在途
+        self.probing = False
+
+    def allow(self) -> bool:
+        """当前是否允许请求通过，半开状态下已有试探请求在途时不再放行"""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open":
+            return not self.probing
+        return self.state == "closed"
+
+    def begin_call(self) -> bool:
+        """开始一次调用，半开状态下这次调用即为试探请求，返回 True"""
+        if self.state == "half_open":
+            self.probing = True
+            return True
+        return False
+
+    def end_probe(self):
+        """试探请求结束（包括被取消），允许放行下一个试探请求"""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+class BackendConnection:
+    """单个后端进程（副本）的连接，stdio 与会话上下文由独立任务持有"""
+
+    def __init__(
+        self,
+        server: dict,
+        replica: int = 0,
+        servers_dir: str = ".",
+        breaker: Optional[CircuitBreaker] = None,
+        metrics: Optional[ProxyMetrics] = None,
+        message_handler: Optional[MessageHandler] = None
+    ):
+        self.name: str = server["name"]
+        self.server = server
+        self.replica = replica
+        self.servers_dir = servers_dir
+        self.metrics = metrics
+        # 进度通知以外的消息（如 tools/list_changed）交给 message_handler 处理
+        self.message_handler = message_handler
+        self.label = f"{self.name}#{replica}"
+        self.session: Optional[ClientSession] = None
+        self.tools: List[Any] = []
+        self.timings: Dict[str, float] = {}
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.breaker = breaker or CircuitBreaker()
+        self.ping_failures = 0
+        # 进程已退出时 stdio 流会被关闭，后续请求立即报错而不是挂起
+        self.transport_closed = False
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: Optional[Exception] = None
+        self._task: Optional[asyncio.Task] = None
+        # 转发给后端的进度令牌 -> 调用方的进度回调
+        self._progress: Dict[int, ProgressCallback] = {}
+        self._progress_seq = 0
+
+    async def start(self, timeout: float):
+        """启动后端进程并等待握手完成，超时则终止该后端"""
+        params = build_server_params(self.server, self.servers_dir)
+        self._task = asyncio.create_task(self._run(params))
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise TimeoutError(f"startup timed out after {timeout:.1f}s")
+        except asyncio.CancelledError:
+            await self.stop()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self, params: StdioServerParameters):
+        """在同一个任务中进入和退出 stdio/会话上下文，直到收到停止信号"""
+        started = time.perf_counter()
+        try:
+            async with stdio_client(params) as (stdio, write):
+                self.timings["spawn"] = time.perf_counter() - started
+                async with ClientSession(stdio, write, message_handler=self._on_message) as session:
+                    mark = time.perf_counter()
+                    await session.initialize()
+                    self.timings["initialize"] = time.perf_counter() - mark
+
+                    mark = time.perf_counter()
+                    response = await session.list_tools()
+                    self.timings["list_tools"] = time.perf_counter() - mark
+                    self.timings["total"] = time.perf_counter() - started
+
+                    self.session = session
+                    self.tools = response.tools
+                    self.last_used = time.monotonic()
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            if self.session is not None and not self._stop.is_set():
+                logger.warning(f"{self.label} exited unexpectedly: {str(self._error)}")
+            self.session = None
+            self._ready.set()
+
+    @property
+    def is_running(self) -> bool:
+        return self.session is not None
+
+    @property
+    def is_available(self) -> bool:
+        """进程在运行且熔断器允许请求通过"""
+        return self.is_running and self.breaker.allow()
+
+    async def _on_message(self, message):
+        """把后端的进度通知转发给对应调用方，其他消息交给 message_handler"""
+        if not (isinstance(message, types.ServerNotification) and isinstance(message.root, types.ProgressNotification)):
+            if self.message_handler is not None:
+                await self.message_handler(message)
+            return
+        params = message.root.params
+        callback = self._progress.get(params.progressToken)
+        if callback is not None:
+            try:
+                await callback(params.progress, params.total)
+            except Exception as e:
+                logger.debug(f"Failed to relay progress from {self.label}: {str(e)}")
+
+    async def _call_with_progress(self, tool_name: str, tool_args: dict, progress: ProgressCallback) -> types.CallToolResult:
+        """带进度令牌调用工具，令牌在本连接内唯一，避免不同调用方的令牌冲突"""
+        self._progress_seq += 1
+        token = self._progress_seq
+        self._progress[token] = progress
+        try:
+            request = types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=tool_name,
+                    arguments=tool_args,
+                    _meta=types.RequestParams.Meta(progressToken=token)
+                )
+            )
+            return await self.session.send_request(types.ClientRequest(request), types.CallToolResult)
+        finally:
+            self._progress.pop(token, None)
+
+    async def call_tool(self, tool_name: str, tool_args: dict, progress: Optional[ProgressCallback] = None):
+        """通过该后端调用工具，记录在途请求数、最近使用时间和熔断器状态"""
+        if self.session is None:
+            raise RuntimeError(f"{self.label} is not running")
+        # 从 pick() 选中到这里之间没有 await，其他调用不会抢到同一个试探名额
+        probe = self.breaker.begin_call()
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            if progress is None:
+                result = await self.session.call_tool(tool_name, tool_args)
+            else:
+                result = await self._call_with_progress(tool_name, tool_args, progress)
+        except McpError:
+            # 后端正常返回了协议错误，说明进程本身是健康的
+            self.breaker.record_success()
+            raise
+        except TRANSPORT_ERRORS:
+            self.transport_closed = True
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            if probe:
+                self.breaker.end_probe()
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+            if self.metrics is not None:
+                self.metrics.call_stats(self.name, tool_name).backend_latency.observe(time.perf_counter() - started)
+        self.breaker.record_success()
+        return result
+
+    async def ping(self, timeout: float) -> bool:
+        """发送 ping 检查后端是否存活，结果计入熔断器"""
+        if self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+        except TRANSPORT_ERRORS:
+            self.transport_closed = True
+            self.breaker.record_failure()
+            logger.warning(f"Health check failed for {self.label}: connection closed")
+            return False
+        except Exception as e:
+            self.ping_failures += 1
+            self.breaker.record_failure()
+            logger.warning(f"Health check failed for {self.label} ({self.ping_failures}): {type(e).__name__} {str(e)}")
+            return False
+        self.ping_failures = 0
+        self.breaker.record_success()
+        return True
+
+    async def stop(self):
+        """通知后端退出并等待其任务结束，尚未完成握手的后端直接取消"""
+        self._stop.set()
+        if not self._task or self._task.done():
+            return
+        if self.session is None:
+            self._task.cancel()
+        done, _ = await asyncio.wait({self._task}, timeout=5)
+        if not done:
+            logger.warning(f"{self.label} did not exit in time, cancelling")
+            self._task.cancel()
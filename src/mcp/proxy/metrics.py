@@ -0,0 +1,164 @@
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# 延迟直方图的桶上界（秒），覆盖从亚毫秒级的代理转发到分钟级的图片生成
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+class Histogram:
+    """固定桶的延迟直方图，记录一次观测只需一次二分查找，分位数按桶内线性插值估算"""
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """估算分位数（秒）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self) -> dict:
+        """返回次数和以毫秒为单位的平均值、p50/p95/p99、最大值"""
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "p99_ms": round(self.quantile(0.99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2)
+        }
+
+class CallStats:
+    """单个工具在单个后端上的调用统计"""
+    __slots__ = ("calls", "errors", "in_flight", "latency", "backend_latency")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        # latency 为代理收到调用到返回的总耗时（含排队、缓存），backend_latency 为后端往返耗时
+        self.latency = Histogram(buckets)
+        self.backend_latency = Histogram(buckets)
+
+    def snapshot(self) -> dict:
+        latency = self.latency.snapshot()
+        backend_latency = self.backend_latency.snapshot()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency": latency,
+            "backend_latency": backend_latency,
+            # 代理自身（排队、转发、序列化）引入的中位数开销
+            "proxy_overhead_p50_ms": round(max(0.0, latency["p50_ms"] - backend_latency["p50_ms"]), 2)
+        }
+
+class ProxyMetrics:
+    """代理的进程内指标：按 (后端, 工具) 统计调用次数、错误数、在途数和延迟，以及各副本的启动耗时"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self.calls: Dict[Tuple[str, str], CallStats] = {}
+        self.startup_seconds: Dict[Tuple[str, int], float] = {}
+
+    def call_stats(self, backend: str, tool: str) -> CallStats:
+        """获取 (后端, 工具) 的统计对象，不存在时创建"""
+        key = (backend, tool)
+        stats = self.calls.get(key)
+        if stats is None:
+            stats = self.calls[key] = CallStats(self.buckets)
+        return stats
+
+    def record_startup(self, backend: str, replica: int, seconds: float):
+        self.startup_seconds[(backend, replica)] = seconds
+
+    def snapshot(self) -> dict:
+        """按工具和后端汇总的指标快照"""
+        tools: Dict[str, dict] = {}
+        backends: Dict[str, dict] = {}
+        for (backend, tool), stats in sorted(self.calls.items()):
+            tools[tool] = dict(backend=backend, **stats.snapshot())
+            summary = backends.setdefault(backend, {"calls": 0, "errors": 0, "in_flight": 0})
+            summary["calls"] += stats.calls
+            summary["errors"] += stats.errors
+            summary["in_flight"] += stats.in_flight
+        for (backend, replica), seconds in sorted(self.startup_seconds.items()):
+            summary = backends.setdefault(backend, {"calls": 0, "errors": 0, "in_flight": 0})
+            summary.setdefault("startup_ms", {})[str(replica)] = round(seconds * 1000, 1)
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "tools": tools,
+            "backends": backends
+        }
+
+    def render_prometheus(
+        self,
+        gauges: Optional[Dict[str, float]] = None,
+        counters: Optional[Dict[str, float]] = None
+    ) -> str:
+        """按 Prometheus 文本格式导出全部指标，gauges 和 counters 为附加的无标签指标，counter 名称应以 _total 结尾"""
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, attr: str, help_text: str):
+            header(name, "histogram", help_text)
+            for (backend, tool), stats in sorted(self.calls.items()):
+                hist: Histogram = getattr(stats, attr)
+                labels = f'backend="{backend}",tool="{tool}"'
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, hist.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        for name, attr, kind, help_text in (
+            ("mcp_proxy_tool_calls_total", "calls", "counter", "Tool calls handled by the proxy"),
+            ("mcp_proxy_tool_errors_total", "errors", "counter", "Tool calls that failed or returned isError"),
+            ("mcp_proxy_tool_in_flight", "in_flight", "gauge", "Tool calls currently in flight")
+        ):
+            header(name, kind, help_text)
+            for (backend, tool), stats in sorted(self.calls.items()):
+                lines.append(f'{name}{{backend="{backend}",tool="{tool}"}} {getattr(stats, attr)}')
+
+        histogram("mcp_proxy_tool_latency_seconds", "latency", "End-to-end tool call latency through the proxy")
+        histogram("mcp_proxy_backend_latency_seconds", "backend_latency", "Round-trip latency of the backend call")
+
+        header("mcp_proxy_backend_startup_seconds", "gauge", "Startup time of each backend replica")
+        for (backend, replica), seconds in sorted(self.startup_seconds.items()):
+            lines.append(f'mcp_proxy_backend_startup_seconds{{backend="{backend}",replica="{replica}"}} {seconds}')
+
+        for kind, values in (("gauge", gauges), ("counter", counters)):
+            for name, value in (values or {}).items():
+                header(name, kind, name.replace("_", " "))
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -3,13 +3,23 @@ import os
 import asyncio
 import platform
 import logging
+import signal
+import time
+import weakref
 from pathlib import Path
-from typing import Any, Dict
-from mcp.server.fastmcp import FastMCP
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Set
+from mcp import types
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.server.fastmcp.server import _convert_to_content
+from mcp.server.lowlevel import NotificationOptions
+from mcp.server.session import ServerSession
+from mcp.server.stdio import stdio_server
 from dotenv import load_dotenv
+from result_cache import ResultCache
+from metrics import ProxyMetrics
+from backends import (
+    TRANSPORT_ERRORS, BackendConnection, CircuitBreaker, ProgressCallback, normalize_path, read_server_config
+)
 
 # 配置日志
 logging.basicConfig(
@@ -19,7 +29,6 @@ logging.basicConfig(
 logger = logging.getLogger("ProxyServer")
 
 mcp = FastMCP("ProxyServer")
-exit_stack = AsyncExitStack()
 
 # 加载 .env 文件并设置默认路径
 load_dotenv()
@@ -28,44 +37,55 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 CONFIG_FILE = os.getenv("CONFIG_FILE", str(PROJECT_ROOT / "servers.json"))
 SERVERS_DIR = os.getenv("SERVERS_DIR", str(PROJECT_ROOT / "servers"))
-
-def normalize_path(path: str) -> str:
-    """标准化路径，确保跨平台兼容性"""
-    return str(Path(path).resolve())
-
-def get_python_command() -> str:
-    """获取 Python 命令，考虑不同平台"""
-    if platform.system() == "Windows":
-        return "python"
-    return "python3"
-
-def get_node_command() -> str:
-    """获取 Node.js 命令，考虑不同平台"""
-    if platform.system() == "Windows":
-        return "node"
-    return "node"
+# 单个后端启动（进程拉起 + 握手 + 工具列表）的超时时间，单位秒
+BACKEND_STARTUP_TIMEOUT = float(os.getenv("BACKEND_STARTUP_TIMEOUT", "60"))
+# 懒加载模式：启动时只从工具清单缓存注册工具，后端进程在首次被调用时才拉起
+LAZY_START = os.getenv("PROXY_LAZY_START", "false").lower() in ("1", "true", "yes")
+# 懒加载模式下后端空闲多久后被回收，单位秒，0 表示不回收
+BACKEND_IDLE_TIMEOUT = float(os.getenv("BACKEND_IDLE_TIMEOUT", "300"))
+# 工具清单缓存文件，记录每个后端上次启动时注册的工具，只在懒加载模式或显式设置了 TOOL_MANIFEST_FILE 时写入
+TOOL_MANIFEST_FILE = os.getenv("TOOL_MANIFEST_FILE", str(PROJECT_ROOT / "tool_manifest.json"))
+SAVE_TOOL_MANIFEST = LAZY_START or "TOOL_MANIFEST_FILE" in os.environ
+# 空闲回收检查间隔，单位秒
+REAP_INTERVAL = 5
+# 工具目录变化后等待多久再发送 tools/list_changed 通知，合并启动或热加载时的连续变化，单位秒
+TOOLS_CHANGED_DEBOUNCE = 0.2
+# 批量调用的默认并发上限和单个调用的默认超时时间（秒）
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_CALL_TIMEOUT = float(os.getenv("BATCH_CALL_TIMEOUT", "60"))
+# 工具结果缓存的条目数上限、字节预算和默认 TTL（秒），哪些工具可缓存在 servers.json 的 cache 字段中配置
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_DEFAULT_TTL = float(os.getenv("RESULT_CACHE_DEFAULT_TTL", "300"))
+# 健康检查：ping 间隔与超时（秒），连续失败达到阈值后熔断，冷却时间（秒）后放行试探请求
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# 后端重启失败后的最大退避时间（秒）
+RESTART_BACKOFF_MAX = float(os.getenv("RESTART_BACKOFF_MAX", "60"))
+# 准入控制：每个后端的默认并发上限（0 表示不限制）、等待队列长度和排队超时（秒）
+# 也可在 servers.json 中通过 max_concurrency、max_queue、queue_timeout 和 tool_concurrency 为单个后端/工具设置
+BACKEND_MAX_CONCURRENCY = int(os.getenv("BACKEND_MAX_CONCURRENCY", "0"))
+BACKEND_MAX_QUEUE = int(os.getenv("BACKEND_MAX_QUEUE", "100"))
+BACKEND_QUEUE_TIMEOUT = float(os.getenv("BACKEND_QUEUE_TIMEOUT", "30"))
+# 配置热加载：检查 servers.json 是否变化的间隔（秒，0 表示不监听文件），被移除后端的最长排空时间（秒）
+CONFIG_WATCH_INTERVAL = float(os.getenv("CONFIG_WATCH_INTERVAL", "2"))
+RELOAD_DRAIN_TIMEOUT = float(os.getenv("RELOAD_DRAIN_TIMEOUT", "30"))
+# Prometheus 指标导出：定期写入的文本文件路径、HTTP 端点的监听地址和端口（为空或 0 表示不导出）
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "15"))
 
 def load_server_config(config_file: str) -> list:
     """加载服务器配置"""
     try:
-        config_file = normalize_path(config_file)
-        if not os.path.exists(config_file):
-            logger.warning(f"Config file not found at {config_file}, using empty server list")
+        if not os.path.exists(normalize_path(config_file)):
+            logger.warning(f"Config file not found at {normalize_path(config_file)}, using empty server list")
             return []
-        
-        with open(config_file, 'r', encoding='utf-8') as f:
-            servers = json.load(f)
-            
-        if not isinstance(servers, list):
-            raise ValueError("Config file must contain a list of server configurations")
-            
-        # 验证每个服务器配置
-        for server in servers:
-            if not isinstance(server, dict):
-                raise ValueError("Each server configuration must be a dictionary")
-            if "name" not in server or "script" not in server:
-                raise ValueError("Each server configuration must have 'name' and 'script' fields")
-                
+
+        servers = read_server_config(config_file)
         logger.info(f"Successfully loaded {len(servers)} server configurations")
         return servers
     except Exception as e:
@@ -73,101 +93,913 @@ def load_server_config(config_file: str) -> list:
         return []
 
 SERVERS = load_server_config(CONFIG_FILE)
-sessions: Dict[str, ClientSession] = {}
+server_configs: Dict[str, dict] = {server["name"]: server for server in SERVERS}
 tool_mapping: Dict[str, str] = {}
+# 后端工具的原始定义（含 inputSchema），以真实工具名直接暴露给调用方
+tool_catalog: Dict[str, types.Tool] = {}
+# 获取过工具列表的调用方会话，工具目录变化时通知其重新获取
+tool_subscribers: "weakref.WeakSet[ServerSession]" = weakref.WeakSet()
+tools_changed_pending = False
+tools_changed_task: Optional[asyncio.Task] = None
+backends: Dict[str, "BackendPool"] = {}
+pending_startups: Set[asyncio.Task] = set()
+startup_locks: Dict[str, asyncio.Lock] = {}
+tool_manifest: Dict[str, dict] = {}
+# 热加载后正在排空、等待停止的旧后端
+retired_backends: Set["BackendPool"] = set()
+metrics = ProxyMetrics()
+reload_lock = asyncio.Lock()
+result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES)
+
+class ProxyError(Exception):
+    """代理自身的错误（工具缺失、未知工具、后端未连接等），消息直接返回给调用方"""
+
+class OverloadedError(ProxyError):
+    """后端过载：等待队列已满或排队超时"""
+
+def get_script_path(script_name: str) -> str:
+    """构建服务器脚本的完整路径"""
+    return normalize_path(os.path.join(SERVERS_DIR, script_name))
+
+def new_connection(server: dict, replica: int) -> BackendConnection:
+    """按代理的配置创建后端副本连接，调用延迟计入代理指标"""
+    breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+    return BackendConnection(server, replica, SERVERS_DIR, breaker, metrics)
+
+class AdmissionQueue:
+    """准入控制：限制同时执行的调用数，超出的调用进入有界等待队列，队列满或排队超时则直接拒绝"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self, deadline: float):
+        """获取执行名额，deadline 为 time.monotonic() 下的排队截止时间"""
+        if self._semaphore is None:
+            return
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            self.admitted += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(f"{self.name} 过载：等待队列已满（{self.max_queue}）")
+
+        self.waiting += 1
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - started))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise OverloadedError(f"{self.name} 过载：排队超过 {self.queue_timeout:.1f}s")
+        finally:
+            self.waiting -= 1
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        self.admitted += 1
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        """返回队列深度和等待时间统计"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait / self.queued * 1000, 1) if self.queued else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+
+def get_admission_queue(name: str, server: dict, tool_name: Optional[str] = None) -> AdmissionQueue:
+    """按服务器配置创建后端级或工具级的准入队列"""
+    if tool_name is None:
+        max_concurrency = int(server.get("max_concurrency", BACKEND_MAX_CONCURRENCY))
+    else:
+        max_concurrency = int(server.get("tool_concurrency", {}).get(tool_name, 0))
+    return AdmissionQueue(
+        name,
+        max_concurrency=max_concurrency,
+        max_queue=int(server.get("max_queue", BACKEND_MAX_QUEUE)),
+        queue_timeout=float(server.get("queue_timeout", BACKEND_QUEUE_TIMEOUT))
+    )
+
+class BackendPool:
+    """同一后端的一组副本进程，每次调用分发给在途请求最少的健康副本"""
+
+    def __init__(self, server: dict):
+        self.name: str = server["name"]
+        self.server = server
+        self.size: int = server.get("replicas", 1)
+        self.replicas: List[BackendConnection] = []
+        self.restarts = 0
+        self.apply_settings(server)
+        self._restarting: Dict[int, asyncio.Task] = {}
+        self._cursor = 0
+
+    def apply_settings(self, server: dict):
+        """应用不需要重启进程的配置（准入控制等），进行中的调用仍使用原来的队列"""
+        self.server = server
+        for replica in self.replicas:
+            replica.server = server
+        self.admission = get_admission_queue(f"服务器 {self.name}", server)
+        self.tool_admission: Dict[str, AdmissionQueue] = {
+            tool_name: get_admission_queue(f"工具 {tool_name}", server, tool_name)
+            for tool_name in server.get("tool_concurrency", {})
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return any(replica.is_running for replica in self.replicas)
+
+    @property
+    def is_restarting(self) -> bool:
+        return bool(self._restarting)
+
+    @property
+    def queued(self) -> int:
+        return self.admission.waiting + sum(queue.waiting for queue in self.tool_admission.values())
+
+    @property
+    def tools(self) -> List[Any]:
+        for replica in self.replicas:
+            if replica.is_running:
+                return replica.tools
+        return []
+
+    @property
+    def in_flight(self) -> int:
+        return sum(replica.in_flight for replica in self.replicas)
+
+    @property
+    def last_used(self) -> float:
+        return max((replica.last_used for replica in self.replicas), default=time.monotonic())
+
+    @property
+    def startup_timeout(self) -> float:
+        return float(self.server.get("startup_timeout", BACKEND_STARTUP_TIMEOUT))
+
+    async def start(self, timeout: float):
+        """并发启动所有副本，至少一个副本启动成功即可提供服务，失败的副本交给巡检任务重启"""
+        self.replicas = [new_connection(self.server, i) for i in range(self.size)]
+        results = await asyncio.gather(
+            *(replica.start(timeout) for replica in self.replicas),
+            return_exceptions=True
+        )
+        errors = []
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to start {replica.label}: {str(result)}")
+                errors.append(result)
+                continue
+            log_startup_timings(replica)
+        if not self.is_running:
+            raise errors[0]
+
+    def pick(self) -> Optional[BackendConnection]:
+        """选出在途请求最少的健康副本，负载相同时轮流选择"""
+        healthy = [replica for replica in self.replicas if replica.is_available]
+        if not healthy:
+            return None
+        self._cursor = (self._cursor + 1) % len(healthy)
+        ordered = healthy[self._cursor:] + healthy[:self._cursor]
+        return min(ordered, key=lambda replica: replica.in_flight)
+
+    async def call_tool(self, tool_name: str, tool_args: dict, progress: Optional[ProgressCallback] = None):
+        """通过工具级和后端级准入队列后，将调用分发到负载最低的副本，没有可用副本时立即失败"""
+        admission = self.admission
+        deadline = time.monotonic() + admission.queue_timeout
+        tool_queue = self.tool_admission.get(tool_name)
+        if tool_queue is not None:
+            await tool_queue.acquire(deadline)
+        try:
+            await admission.acquire(deadline)
+            try:
+                replica = self.pick()
+                if replica is None:
+                    raise ProxyError(f"服务器 {self.name} 暂不可用（熔断中或正在重启）")
+                try:
+                    return await replica.call_tool(tool_name, tool_args, progress)
+                except TRANSPORT_ERRORS:
+                    self.schedule_restart(replica.replica)
+                    raise ProxyError(f"服务器 {replica.label} 连接已断开，正在重启")
+            finally:
+                admission.release()
+        finally:
+            if tool_queue is not None:
+                tool_queue.release()
+
+    def needs_restart(self, replica: BackendConnection) -> bool:
+        """进程已退出或连续多次健康检查失败（卡死）的副本需要重启"""
+        return (
+            not replica.is_running
+            or replica.transport_closed
+            or replica.ping_failures >= CIRCUIT_FAILURE_THRESHOLD
+        )
+
+    def schedule_restart(self, index: int):
+        """在后台重启指定副本，同一副本同时只会有一个重启任务"""
+        if index in self._restarting:
+            return
+        task = asyncio.create_task(self._restart(index))
+        self._restarting[index] = task
+        task.add_done_callback(lambda _: self._restarting.pop(index, None))
+
+    async def _restart(self, index: int):
+        """停止旧副本并启动新副本，启动失败时按指数退避重试"""
+        old = self.replicas[index]
+        logger.warning(f"Restarting {old.label}")
+        await old.stop()
+        attempt = 0
+        while True:
+            replica = new_connection(self.server, index)
+            try:
+                await replica.start(self.startup_timeout)
+                break
+            except Exception as e:
+                attempt += 1
+                delay = min(RESTART_BACKOFF_MAX, 2 ** attempt)
+                logger.error(f"Failed to restart {replica.label}: {str(e)}, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+        self.replicas[index] = replica
+        self.restarts += 1
+        log_startup_timings(replica)
+        # 重启后的后端可能更新了工具列表，重新注册；热加载中已被替换或移除的后端不再注册
+        if backends.get(self.name) is self:
+            register_backend(self)
+
+    async def stop(self):
+        """停止所有副本以及进行中的重启"""
+        for task in list(self._restarting.values()):
+            task.cancel()
+        await asyncio.gather(*(replica.stop() for replica in self.replicas))
+
+    def status(self) -> dict:
+        """返回各副本的运行状态、在途请求数和熔断器状态"""
+        return {
+            "running": self.is_running,
+            "in_flight": self.in_flight,
+            "restarts": self.restarts,
+            "admission": self.admission.stats(),
+            "tool_admission": {name: queue.stats() for name, queue in self.tool_admission.items()},
+            "replicas": [
+                {
+                    "replica": replica.replica,
+                    "running": replica.is_running,
+                    "in_flight": replica.in_flight,
+                    "circuit": replica.breaker.state,
+                    "circuit_trips": replica.breaker.trips,
+                    "restarting": replica.replica in self._restarting
+                }
+                for replica in self.replicas
+            ]
+        }
+
+def log_startup_timings(replica: BackendConnection):
+    """输出副本的启动耗时明细"""
+    t = replica.timings
+    metrics.record_startup(replica.name, replica.replica, t["total"])
+    logger.info(
+        f"{replica.label} started in {t['total']:.2f}s "
+        f"(spawn {t['spawn']:.2f}s, initialize {t['initialize']:.2f}s, list_tools {t['list_tools']:.2f}s)"
+    )
+
+def get_script_mtime(server: dict) -> Optional[float]:
+    """获取服务器脚本的修改时间，用于判断工具清单缓存是否过期"""
+    try:
+        return os.path.getmtime(get_script_path(server["script"]))
+    except OSError:
+        return None
+
+def load_tool_manifest(manifest_file: str) -> dict:
+    """加载工具清单缓存，格式为 {server_name: {"script": ..., "mtime": ..., "tools": [...]}}"""
+    try:
+        manifest_file = normalize_path(manifest_file)
+        if not os.path.exists(manifest_file):
+            return {}
+
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if not isinstance(manifest, dict):
+            raise ValueError("Tool manifest must be a dictionary")
+        return manifest
+    except Exception as e:
+        logger.warning(f"Error loading tool manifest: {str(e)}")
+        return {}
+
+def save_tool_manifest(backend: BackendPool):
+    """将后端当前的工具列表写入工具清单缓存"""
+    tool_manifest[backend.name] = {
+        "script": backend.server["script"],
+        "mtime": get_script_mtime(backend.server),
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in backend.tools]
+    }
+    try:
+        manifest_file = normalize_path(TOOL_MANIFEST_FILE)
+        tmp_file = f"{manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(tool_manifest, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, manifest_file)
+    except Exception as e:
+        logger.warning(f"Error saving tool manifest: {str(e)}")
+
+def get_cached_tools(server: dict) -> Optional[List[types.Tool]]:
+    """从工具清单缓存中取出后端的工具列表，脚本变更或无缓存时返回 None"""
+    entry = tool_manifest.get(server["name"])
+    if not isinstance(entry, dict):
+        return None
+    if entry.get("script") != server["script"] or entry.get("mtime") != get_script_mtime(server):
+        return None
+    try:
+        return [types.Tool.model_validate(tool) for tool in entry.get("tools", [])]
+    except Exception as e:
+        logger.warning(f"Ignoring invalid tool manifest entry for {server['name']}: {str(e)}")
+        return None
+
+def notify_tools_changed():
+    """工具目录发生变化，稍后向调用方发送 tools/list_changed 通知"""
+    global tools_changed_pending, tools_changed_task
+    tools_changed_pending = True
+    if tool_subscribers and (tools_changed_task is None or tools_changed_task.done()):
+        tools_changed_task = asyncio.create_task(send_tools_changed())
+
+async def send_tools_changed():
+    """合并短时间内的多次变化后发送通知，发送期间又有变化时再发一次"""
+    global tools_changed_pending
+    while tools_changed_pending:
+        await asyncio.sleep(TOOLS_CHANGED_DEBOUNCE)
+        tools_changed_pending = False
+        for session in list(tool_subscribers):
+            try:
+                await session.send_tool_list_changed()
+            except Exception as e:
+                tool_subscribers.discard(session)
+                logger.debug(f"Dropping tool list subscriber: {str(e)}")
+
+def register_tools(server_name: str, tools: List[types.Tool]):
+    """更新工具到后端的映射和工具目录，注册后即可被代理调用，有变化时通知调用方"""
+    changed = False
+    tool_names = {tool.name for tool in tools}
+    for name in [name for name, owner in tool_mapping.items() if owner == server_name and name not in tool_names]:
+        del tool_mapping[name]
+        tool_catalog.pop(name, None)
+        changed = True
+        logger.info(f"Unregistered tool '{name}' from {server_name}")
+    for tool in tools:
+        if tool_catalog.get(tool.name) != tool:
+            tool_catalog[tool.name] = tool
+            changed = True
+        if tool_mapping.get(tool.name) != server_name:
+            tool_mapping[tool.name] = server_name
+            changed = True
+            logger.info(f"Registered tool '{tool.name}' from {server_name}")
+    if changed:
+        notify_tools_changed()
+
+def register_backend(backend: BackendPool):
+    """注册后端会话及其工具，需要时刷新工具清单缓存"""
+    backends[backend.name] = backend
+    register_tools(backend.name, backend.tools)
+    if SAVE_TOOL_MANIFEST:
+        save_tool_manifest(backend)
+
+async def start_server(server: dict) -> Optional[BackendPool]:
+    """启动单个后端的全部副本，失败或超时只影响该后端"""
+    server_name = server["name"]
+    timeout = float(server.get("startup_timeout", BACKEND_STARTUP_TIMEOUT))
+    backend = BackendPool(server)
+    try:
+        await backend.start(timeout)
+    except Exception as e:
+        logger.error(f"Failed to initialize {server_name}: {str(e)}")
+        return None
+
+    register_backend(backend)
+    return backend
+
+async def get_backend(server_name: str) -> Optional[BackendPool]:
+    """获取正在运行的后端，懒加载模式下按需拉起，并发的首次调用只会启动一次"""
+    backend = backends.get(server_name)
+    if backend and (backend.is_running or backend.is_restarting or not LAZY_START):
+        return backend
+    if not LAZY_START or server_name not in server_configs:
+        return None
+
+    lock = startup_locks.setdefault(server_name, asyncio.Lock())
+    async with lock:
+        backend = backends.get(server_name)
+        if backend and backend.is_running:
+            return backend
+        server = server_configs.get(server_name)
+        if server is None:
+            return None
+        logger.info(f"Starting {server_name} on demand")
+        return await start_server(server)
 
 async def initialize_servers():
-    """初始化所有服务器连接"""
+    """并发初始化所有服务器连接，懒加载模式下只启动没有工具清单缓存的后端"""
     if not SERVERS:
         logger.warning("No servers configured, skipping initialization")
         return
-        
-    for server in SERVERS:
-        try:
-            server_name = server["name"]
-            script_name = server["script"]
-            
-            # 构建服务器脚本的完整路径
-            script_path = normalize_path(os.path.join(SERVERS_DIR, script_name))
-            if not os.path.exists(script_path):
-                logger.error(f"Server script not found: {script_path}")
+
+    started = time.perf_counter()
+    to_start = SERVERS
+    if SAVE_TOOL_MANIFEST:
+        # 先载入已有清单，保存时不会丢掉本次未启动成功的后端的条目
+        tool_manifest.update(load_tool_manifest(TOOL_MANIFEST_FILE))
+    if LAZY_START:
+        to_start = []
+        for server in SERVERS:
+            tools = get_cached_tools(server)
+            if tools is None:
+                to_start.append(server)
                 continue
-                
-            # 确保脚本有执行权限
-            if platform.system() != "Windows":
-                os.chmod(script_path, 0o755)
-                
-            # 根据脚本扩展名确定命令
-            is_python = script_name.endswith('.py')
-            is_js = script_name.endswith('.js')
-            
-            if not (is_python or is_js):
-                logger.error(f"Unsupported script type: {script_name}")
+            register_tools(server["name"], tools)
+        logger.info(
+            f"Lazy mode: {len(SERVERS) - len(to_start)} servers registered from tool manifest, "
+            f"{len(to_start)} started to discover tools"
+        )
+
+    for server in to_start:
+        task = asyncio.create_task(start_server(server))
+        pending_startups.add(task)
+        task.add_done_callback(pending_startups.discard)
+    await asyncio.gather(*pending_startups)
+    logger.info(
+        f"Backend startup finished in {time.perf_counter() - started:.2f}s, "
+        f"{len(backends)}/{len(to_start)} servers available"
+    )
+
+async def reap_idle_backends():
+    """定期回收空闲超时的后端进程，下次调用时再按需拉起"""
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        now = time.monotonic()
+        for server_name, backend in list(backends.items()):
+            idle_timeout = float(backend.server.get("idle_timeout", BACKEND_IDLE_TIMEOUT))
+            if idle_timeout <= 0 or backend.in_flight > 0 or backend.queued > 0:
                 continue
-                
-            command = get_python_command() if is_python else get_node_command()
-            server_params = StdioServerParameters(
-                command=command,
-                args=[script_path],
-                env=None
-            )
-            
-            # 建立连接
-            stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-            stdio, write = stdio_transport
-            session = await exit_stack.enter_async_context(ClientSession(stdio, write))
-            await session.initialize()
-            
-            # 注册会话和工具
-            sessions[server_name] = session
-            response = await session.list_tools()
-            for tool in response.tools:
-                tool_mapping[tool.name] = server_name
-                logger.info(f"Registered tool '{tool.name}' from {server_name}")
-                
+            idle = now - backend.last_used
+            if idle >= idle_timeout:
+                logger.info(f"Stopping idle backend {server_name} (idle {idle:.0f}s)")
+                backends.pop(server_name, None)
+                await backend.stop()
+
+async def check_backend(backend: BackendPool):
+    """对后端的每个运行中副本做健康检查，需要重启的副本交给后台重启"""
+    running = [replica for replica in backend.replicas if replica.is_running]
+    await asyncio.gather(*(replica.ping(HEALTH_CHECK_TIMEOUT) for replica in running))
+    for index, replica in enumerate(backend.replicas):
+        if backend.needs_restart(replica):
+            backend.schedule_restart(index)
+
+async def supervise_backends():
+    """巡检任务：定期 ping 所有后端，重启已退出或卡死的副本，不影响其他后端的调用"""
+    while True:
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+        await asyncio.gather(
+            *(check_backend(backend) for backend in list(backends.values())),
+            return_exceptions=True
+        )
+
+async def drain_and_stop(backend: BackendPool):
+    """等待旧后端上的在途和排队调用完成（最长 RELOAD_DRAIN_TIMEOUT 秒）后停止"""
+    retired_backends.add(backend)
+    try:
+        deadline = time.monotonic() + RELOAD_DRAIN_TIMEOUT
+        while (backend.in_flight > 0 or backend.queued > 0) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if backend.in_flight > 0:
+            logger.warning(f"Stopping {backend.name} with {backend.in_flight} calls still in flight")
+        await backend.stop()
+        logger.info(f"Stopped retired backend {backend.name}")
+    finally:
+        retired_backends.discard(backend)
+
+def retire_backend(backend: Optional[BackendPool]):
+    """在后台排空并停止已被替换或移除的后端"""
+    if backend is not None:
+        asyncio.create_task(drain_and_stop(backend))
+
+def needs_process_restart(old: dict, new: dict) -> bool:
+    """脚本或副本数变化需要重启后端进程，其余配置可以直接生效"""
+    return old["script"] != new["script"] or old.get("replicas", 1) != new.get("replicas", 1)
+
+async def reload_servers() -> dict:
+    """重新加载 servers.json：只启动新增后端、排空并停止被移除的后端，未变化的后端保留现有会话"""
+    async with reload_lock:
+        try:
+            new_servers = read_server_config(CONFIG_FILE)
         except Exception as e:
-            logger.error(f"Failed to initialize {server['name']}: {str(e)}")
+            logger.error(f"Config reload aborted, keeping current servers: {str(e)}")
+            return {"error": str(e)}
+
+        old_configs = dict(server_configs)
+        new_configs = {server["name"]: server for server in new_servers}
+        added = [name for name in new_configs if name not in old_configs]
+        removed = [name for name in old_configs if name not in new_configs]
+        changed = [name for name in new_configs if name in old_configs and new_configs[name] != old_configs[name]]
+        restarted = [name for name in changed if needs_process_restart(old_configs[name], new_configs[name])]
+        updated = [name for name in changed if name not in restarted]
+        summary = {
+            "added": added,
+            "removed": removed,
+            "restarted": restarted,
+            "updated": updated,
+            "unchanged": [name for name in new_configs if name in old_configs and name not in changed]
+        }
+        if not (added or removed or changed):
+            return summary
+
+        # 先切换配置、下线被移除后端的工具，这一段没有 await，对调用方是原子的
+        SERVERS[:] = new_servers
+        server_configs.clear()
+        server_configs.update(new_configs)
+        for name in removed:
+            register_tools(name, [])
+            retire_backend(backends.pop(name, None))
+        for name in updated:
+            backend = backends.get(name)
+            if backend is not None:
+                backend.apply_settings(new_configs[name])
+            if old_configs[name].get("cache", {}) != new_configs[name].get("cache", {}):
+                # 缓存配置（TTL、是否可缓存）变化后，旧条目不再符合新配置，丢弃该后端所有工具的缓存
+                tool_names = {tool for tool, server_name in tool_mapping.items() if server_name == name}
+                tool_names.update(old_configs[name].get("cache", {}), new_configs[name].get("cache", {}))
+                tool_names.discard("*")
+                dropped = result_cache.invalidate_tools(tool_names)
+                logger.info(f"Cache config of {name} changed, dropped {dropped} cached results")
+        if removed or restarted:
+            result_cache.clear()
+
+        to_start = []
+        for name in added + restarted:
+            server = new_configs[name]
+            tools = get_cached_tools(server) if LAZY_START else None
+            if tools is not None:
+                # 懒加载模式下工具清单仍有效，旧进程排空后由下一次调用按需拉起
+                register_tools(name, tools)
+                retire_backend(backends.pop(name, None))
+            else:
+                to_start.append(server)
+
+        async def replace(server: dict):
+            old = backends.get(server["name"])
+            # 新后端启动成功后才替换旧后端，启动失败则保留旧后端继续服务
+            if await start_server(server) is not None:
+                retire_backend(old)
+            elif old is None:
+                logger.error(f"Failed to start new backend {server['name']} after reload")
+            else:
+                logger.error(f"Keeping previous {server['name']} after failed restart")
+
+        await asyncio.gather(*(replace(server) for server in to_start))
+        logger.info(f"Reloaded server config: {json.dumps(summary, ensure_ascii=False)}")
+        return summary
+
+async def watch_config_file():
+    """轮询 servers.json 的修改时间，变化时自动热加载"""
+    def mtime() -> Optional[float]:
+        try:
+            return os.path.getmtime(normalize_path(CONFIG_FILE))
+        except OSError:
+            return None
+
+    last_mtime = mtime()
+    while True:
+        await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+        current = mtime()
+        if current is not None and current != last_mtime:
+            last_mtime = current
+            logger.info("Config file changed, reloading")
+            await reload_servers()
+
+async def wait_for_tool(tool_name: str) -> bool:
+    """工具尚未注册时，等待仍在启动中的后端，直到工具出现或全部启动结束"""
+    while tool_name not in tool_mapping and pending_startups:
+        await asyncio.wait(set(pending_startups), return_when=asyncio.FIRST_COMPLETED)
+    return tool_name in tool_mapping
+
+async def shutdown_servers():
+    """关闭所有后端连接"""
+    await asyncio.gather(*(backend.stop() for backend in list(backends.values()) + list(retired_backends)))
+    backends.clear()
+
+def get_cache_ttl(server_name: str, tool_name: str) -> Optional[float]:
+    """读取工具的缓存配置，返回 TTL；工具不可缓存时返回 None
+
+    servers.json 中的配置格式为 {"cache": {"tool_name": {"ttl": 600}}}，
+    "*" 匹配该后端的所有工具，"cacheable": false 可以显式关闭某个工具的缓存。
+    """
+    cache_config = server_configs.get(server_name, {}).get("cache", {})
+    tool_config = cache_config.get(tool_name, cache_config.get("*"))
+    if not isinstance(tool_config, dict) or not tool_config.get("cacheable", True):
+        return None
+    return float(tool_config.get("ttl", RESULT_CACHE_DEFAULT_TTL))
+
+async def call_backend(
+    server_name: str,
+    tool_name: str,
+    tool_args: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
+):
+    """获取后端并调用工具"""
+    backend = await get_backend(server_name)
+    if backend is None:
+        raise ProxyError(f"服务器 {server_name} 未连接")
+
+    return await backend.call_tool(tool_name, tool_args, progress)
+
+async def forward_tool_call(
+    tool_name: Optional[str],
+    tool_args: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
+) -> types.CallToolResult:
+    """将工具调用转发到对应后端，返回后端的 CallToolResult，可缓存的工具优先读缓存"""
+    if not tool_name:
+        raise ProxyError("工具名称缺失")
+
+    if not await wait_for_tool(tool_name):
+        raise ProxyError(f"未知工具: {tool_name}")
+
+    server_name = tool_mapping[tool_name]
+    stats = metrics.call_stats(server_name, tool_name)
+    stats.calls += 1
+    stats.in_flight += 1
+    started = time.perf_counter()
+    try:
+        ttl = get_cache_ttl(server_name, tool_name)
+        if ttl is None:
+            result = await call_backend(server_name, tool_name, tool_args, progress)
+        else:
+            key = result_cache.make_key(tool_name, tool_args)
+            result = await result_cache.get_or_load(
+                key, ttl, lambda: call_backend(server_name, tool_name, tool_args, progress)
+            )
+        if result.isError:
+            stats.errors += 1
+        return result
+    except (Exception, asyncio.CancelledError):
+        stats.errors += 1
+        raise
+    finally:
+        stats.in_flight -= 1
+        stats.latency.observe(time.perf_counter() - started)
+
+def error_result(message: str) -> types.CallToolResult:
+    """构造 isError 的工具结果"""
+    return types.CallToolResult(content=[types.TextContent(type="text", text=message)], isError=True)
+
+def result_text(result: types.CallToolResult) -> str:
+    """拼接工具结果中的文本内容，非文本内容以类型占位"""
+    return "\n".join(
+        item.text if isinstance(item, types.TextContent) else f"[{item.type}]"
+        for item in result.content
+    )
+
+def get_progress_callback(ctx: Context) -> Optional[ProgressCallback]:
+    """调用方在请求中带了进度令牌时，返回把后端进度转发给调用方的回调"""
+    meta = ctx.request_context.meta
+    if meta is None or meta.progressToken is None:
+        return None
+    return ctx.report_progress
+
+async def call_tool_safely(
+    tool_name: Optional[str],
+    tool_args: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
+) -> types.CallToolResult:
+    """转发工具调用，代理侧的异常转换为 isError 结果"""
+    try:
+        return await forward_tool_call(tool_name, tool_args, progress)
+    except ProxyError as e:
+        return error_result(f"⚠️ {str(e)}")
+    except Exception as e:
+        logger.error(f"Tool call error: {type(e).__name__} {str(e)}")
+        return error_result(f"⚠️ 工具调用失败: {str(e)}")
 
 @mcp.tool(description="代理工具，根据工具名动态调用其他服务端的工具，输入格式为字典：{'tool': 'tool_name', 'args': {...}}")
-async def proxy_tool_call(params: Dict[str, Any]) -> str:
-    """代理工具调用"""
+async def proxy_tool_call(params: Dict[str, Any], ctx: Context) -> types.CallToolResult:
+    """代理工具调用，原样返回后端的全部内容（文本、图片、资源）和 isError"""
+    return await call_tool_safely(params.get("tool"), params.get("args", {}), get_progress_callback(ctx))
+
+@mcp.tool(description=(
+    "批量代理工具，并发调用多个工具（可跨多个后端），按输入顺序返回每个调用的状态、结果和耗时。"
+    "输入格式为列表：[{'tool': 'tool_name', 'args': {...}, 'timeout': 秒(可选)}, ...]，"
+    "max_concurrency 为并发上限，timeout 为单个调用的默认超时（秒）"
+))
+async def proxy_batch_call(
+    calls: List[Dict[str, Any]],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> str:
+    """批量代理工具调用"""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or BATCH_MAX_CONCURRENCY))
+    default_timeout = timeout or BATCH_CALL_TIMEOUT
+
+    async def run_one(index: int, call: Dict[str, Any]) -> dict:
+        tool_name = call.get("tool")
+        item = {"index": index, "tool": tool_name}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                call_timeout = float(call.get("timeout") or default_timeout)
+                result = await asyncio.wait_for(
+                    forward_tool_call(tool_name, call.get("args", {})),
+                    call_timeout
+                )
+                item["status"] = "error" if result.isError else "ok"
+                item["result"] = result_text(result)
+            except asyncio.TimeoutError:
+                item["status"] = "timeout"
+                item["result"] = f"⚠️ 调用超时（{call_timeout:.1f}s）"
+            except OverloadedError as e:
+                item["status"] = "overloaded"
+                item["result"] = f"⚠️ {str(e)}"
+            except ProxyError as e:
+                item["status"] = "error"
+                item["result"] = f"⚠️ {str(e)}"
+            except Exception as e:
+                logger.error(f"Batch tool call error ({tool_name}): {str(e)}")
+                item["status"] = "error"
+                item["result"] = f"⚠️ 工具调用失败: {str(e)}"
+            item["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return item
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_one(i, call) for i, call in enumerate(calls)))
+    logger.info(f"Batch of {len(calls)} calls finished in {time.perf_counter() - started:.2f}s")
+    return json.dumps(results, ensure_ascii=False)
+
+@mcp.tool(description="查看代理状态，包括每个后端各副本的运行状态和在途请求数，以及结果缓存的命中、未命中和淘汰计数")
+async def proxy_status() -> str:
+    """代理后端与缓存状态"""
+    status = {}
+    for server in SERVERS:
+        backend = backends.get(server["name"])
+        if backend is None:
+            status[server["name"]] = {"running": False, "in_flight": 0, "replicas": []}
+        else:
+            status[server["name"]] = backend.status()
+    return json.dumps({"backends": status, "cache": result_cache.stats()}, ensure_ascii=False)
+
+@mcp.tool(description=(
+    "查看代理指标：每个工具的调用次数、错误数、在途数、端到端延迟和后端往返延迟（p50/p95/p99），"
+    "以及各后端副本的启动耗时和结果缓存计数"
+))
+async def proxy_stats() -> str:
+    """代理指标快照"""
+    stats = metrics.snapshot()
+    stats["cache"] = result_cache.stats()
+    return json.dumps(stats, ensure_ascii=False)
+
+def render_metrics() -> str:
+    """生成 Prometheus 文本格式的指标"""
+    cache = result_cache.stats()
+    return metrics.render_prometheus(
+        gauges={f"mcp_proxy_cache_{name}": cache[name] for name in ("entries", "bytes")},
+        counters={f"mcp_proxy_cache_{name}_total": cache[name] for name in ("hits", "misses", "coalesced", "evictions")}
+    )
+
+async def write_metrics_file():
+    """定期把指标写入文本文件，供 node_exporter 的 textfile collector 采集"""
+    path = normalize_path(METRICS_FILE)
+    while True:
+        try:
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(render_metrics())
+            os.replace(tmp_file, path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics file: {str(e)}")
+        await asyncio.sleep(METRICS_INTERVAL)
+
+async def handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """最简 HTTP 处理：任何 GET 请求都返回 Prometheus 文本格式的指标"""
     try:
-        tool_name = params.get("tool")
-        tool_args = params.get("args", {})
-        
-        if not tool_name:
-            return "⚠️ 工具名称缺失"
-            
-        if tool_name not in tool_mapping:
-            return f"⚠️ 未知工具: {tool_name}"
-            
-        server_name = tool_mapping[tool_name]
-        if server_name not in sessions:
-            return f"⚠️ 服务器 {server_name} 未连接"
-            
-        session = sessions[server_name]
-        result = await session.call_tool(tool_name, tool_args)
-        return result.content[0].text
-        
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if request_line.startswith(b"GET"):
+            body = render_metrics().encode("utf-8")
+            head = f"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(body)}\r\n"
+        else:
+            body = b""
+            head = "HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n"
+        writer.write((head + "Connection: close\r\n\r\n").encode("ascii") + body)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def serve_metrics():
+    """在 METRICS_HOST:METRICS_PORT 上提供 Prometheus 指标端点"""
+    server = await asyncio.start_server(handle_metrics_request, METRICS_HOST, METRICS_PORT)
+    logger.info(f"Serving Prometheus metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    async with server:
+        await server.serve_forever()
+
+@mcp.tool(description="重新加载 servers.json：启动新增的后端，排空并停止被移除的后端，未变化的后端保持现有连接")
+async def proxy_reload() -> str:
+    """热加载服务器配置"""
+    return json.dumps(await reload_servers(), ensure_ascii=False)
+
+async def handle_list_tools(request: types.ListToolsRequest) -> types.ServerResult:
+    """列出代理自身的工具和已注册的后端工具，后端工具保留原始名称和 inputSchema"""
+    # 不等待仍在启动的后端：它们注册完成后会通过 tools/list_changed 通知调用方重新获取
+    tool_subscribers.add(mcp.get_context().session)
+    tools = await mcp.list_tools()
+    local_names = {tool.name for tool in tools}
+    tools.extend(tool for name, tool in tool_catalog.items() if name not in local_names)
+    return types.ServerResult(types.ListToolsResult(tools=tools))
+
+async def handle_call_tool(request: types.CallToolRequest) -> types.ServerResult:
+    """替换 FastMCP 默认的 tools/call 处理：工具直接返回 CallToolResult 时原样透传，不再拆开重新包装"""
+    name = request.params.name
+    arguments = request.params.arguments or {}
+    if mcp._tool_manager.get_tool(name) is None:
+        # 后端工具直接转发，参数不经过 FastMCP 的校验和重新包装，由后端按自己的 inputSchema 校验
+        result = await call_tool_safely(name, arguments, get_progress_callback(mcp.get_context()))
+        return types.ServerResult(result)
+    try:
+        result = await mcp._tool_manager.call_tool(name, arguments, context=mcp.get_context())
     except Exception as e:
-        logger.error(f"Tool call error: {str(e)}")
-        return f"⚠️ 工具调用失败: {str(e)}"
+        return types.ServerResult(error_result(str(e)))
+    if not isinstance(result, types.CallToolResult):
+        result = types.CallToolResult(content=list(_convert_to_content(result)), isError=False)
+    return types.ServerResult(result)
+
+mcp._mcp_server.request_handlers[types.ListToolsRequest] = handle_list_tools
+mcp._mcp_server.request_handlers[types.CallToolRequest] = handle_call_tool
 
 async def run_proxy():
     """运行代理服务器"""
     logger.info("Starting MCP ProxyServer")
-    await mcp.run_stdio_async()
+    # 与 FastMCP.run_stdio_async 相同，但声明 tools.listChanged 能力，工具目录变化时通知调用方
+    async with stdio_server() as (read_stream, write_stream):
+        await mcp._mcp_server.run(
+            read_stream,
+            write_stream,
+            mcp._mcp_server.create_initialization_options(NotificationOptions(tools_changed=True))
+        )
 
 async def main():
     """主函数"""
+    # 收到 SIGTERM 时取消主任务，确保后端子进程随代理一起退出；收到 SIGHUP 时热加载配置
+    reloads: Set[asyncio.Task] = set()
+    if platform.system() != "Windows":
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+        def on_sighup():
+            task = asyncio.create_task(reload_servers())
+            reloads.add(task)
+            task.add_done_callback(reloads.discard)
+        loop.add_signal_handler(signal.SIGHUP, on_sighup)
+
+    # 后端在后台并发启动，代理立即开始服务，后端就绪一个注册一个
+    background = [
+        asyncio.create_task(initialize_servers()),
+        asyncio.create_task(supervise_backends())
+    ]
+    if LAZY_START:
+        background.append(asyncio.create_task(reap_idle_backends()))
+    if CONFIG_WATCH_INTERVAL > 0:
+        background.append(asyncio.create_task(watch_config_file()))
+    if METRICS_FILE:
+        background.append(asyncio.create_task(write_metrics_file()))
+    if METRICS_PORT:
+        background.append(asyncio.create_task(serve_metrics()))
     try:
-        await initialize_servers()
         await run_proxy()
+    except asyncio.CancelledError:
+        logger.info("Received termination signal")
     except Exception as e:
         logger.error(f"Fatal error: {str(e)}")
     finally:
         logger.info("Cleaning up resources")
-        await exit_stack.aclose()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await shutdown_servers()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,159 @@
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger("ResultCache")
+
+def default_size_of(value: Any) -> int:
+    """估算缓存值占用的字节数，工具结果按各段内容的文本或 base64 数据长度累加，避免整体序列化大结果"""
+    content = getattr(value, "content", None)
+    if isinstance(content, list):
+        size = 0
+        for item in content:
+            item = getattr(item, "resource", item)
+            data = getattr(item, "text", None) or getattr(item, "data", None) or getattr(item, "blob", None)
+            size += len(data) if isinstance(data, str) else 64
+        return size
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json())
+    return len(str(value))
+
+def default_should_store(value: Any) -> bool:
+    """出错的工具结果不缓存"""
+    return not getattr(value, "isError", False)
+
+class CacheEntry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+class ResultCache:
+    """工具调用结果缓存：按 TTL 过期，按条目数和字节数做 LRU 淘汰，相同的并发请求合并为一次后端调用"""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        size_of: Callable[[Any], int] = default_size_of,
+        should_store: Callable[[Any], bool] = default_should_store
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.should_store = should_store
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(tool_name: str, tool_args: Optional[Dict[str, Any]]) -> str:
+        """由工具名和规范化后的参数生成缓存键"""
+        args = json.dumps(tool_args or {}, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return f"{tool_name}:{args}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取未过期的缓存值，命中时移到 LRU 队尾"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def put(self, key: str, value: Any, ttl: float):
+        """写入缓存，超出条目数或字节预算时淘汰最久未使用的条目"""
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CacheEntry(value, size, time.monotonic() + ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def get_or_load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """命中缓存直接返回；否则调用 loader，同一个键的并发请求共享同一次调用"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, ttl, loader))
+            self._inflight[key] = task
+            task.add_done_callback(self._on_load_done)
+        # 调用方被取消时不影响其他等待同一结果的请求
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, ttl: float, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            if self.should_store(value):
+                self.put(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _on_load_done(task: asyncio.Task):
+        # 所有等待方都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Cache load failed: {task.exception()}")
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def invalidate_tools(self, tool_names: Iterable[str]) -> int:
+        """删除指定工具的全部缓存条目，返回删除的条目数"""
+        prefixes = tuple(f"{tool_name}:" for tool_name in tool_names)
+        if not prefixes:
+            return 0
+        keys = [key for key in self._entries if key.startswith(prefixes)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """返回缓存计数器"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "inflight": len(self._inflight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
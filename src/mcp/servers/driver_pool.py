@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger("DriverPool")
+
+class PooledDriver:
+    """池中的一个浏览器实例及其使用次数"""
+    __slots__ = ("driver", "uses", "created_at")
+
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+class DriverPool:
+    """预先启动、可复用的 WebDriver 池
+
+    浏览器在后台线程中启动和操作；取出时做健康检查，归还时清理 Cookie 和存储，
+    使用次数达到 max_uses、崩溃或清理失败的浏览器会被关闭并按需重新启动。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 2,
+        max_uses: int = 50,
+        acquire_timeout: float = 60,
+        health_timeout: float = 5
+    ):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+        self.health_timeout = health_timeout
+        self._idle: "asyncio.LifoQueue[PooledDriver]" = asyncio.LifoQueue()
+        # 已启动（含使用中和启动中）的浏览器数量，不超过 size
+        self._total = 0
+        self._closed = False
+        # 正在等待归还的调用方数量，有浏览器被关闭时据此补充新实例
+        self._waiters = 0
+        self._warm_task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.acquires = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def start(self, warm: int = 0):
+        """在后台预热 warm 个浏览器，不阻塞服务启动"""
+        warm = min(warm, self.size)
+        if warm > 0:
+            self._warm_task = asyncio.create_task(self._warm(warm))
+
+    async def _warm(self, count: int):
+        async def warm_one():
+            try:
+                self._idle.put_nowait(await self._create())
+            except Exception as e:
+                logger.warning(f"Failed to prewarm browser: {str(e)}")
+
+        await asyncio.gather(*(warm_one() for _ in range(count)))
+        logger.info(f"Driver pool warmed: {self._idle.qsize()} browsers idle")
+
+    async def _create(self) -> PooledDriver:
+        """启动一个新的浏览器，计入池容量，失败时释放名额"""
+        self._total += 1
+        started = time.perf_counter()
+        try:
+            driver = await asyncio.get_running_loop().run_in_executor(None, self.factory)
+        except Exception:
+            self._total -= 1
+            raise
+        self.created += 1
+        logger.info(f"Browser started in {time.perf_counter() - started:.2f}s ({self._total}/{self.size})")
+        return PooledDriver(driver)
+
+    async def _discard(self, item: PooledDriver):
+        """关闭浏览器并释放名额，有调用方在等待时补充一个新实例"""
+        self._total -= 1
+        if self._waiters and not self._closed:
+            asyncio.create_task(self._warm(1))
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, item.driver.quit)
+        except Exception as e:
+            logger.debug(f"Error quitting browser: {str(e)}")
+
+    def _is_healthy(self, item: PooledDriver) -> bool:
+        try:
+            return item.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    async def _check(self, item: PooledDriver) -> bool:
+        """在后台线程中执行一条脚本，确认浏览器仍然可用"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(None, self._is_healthy, item), self.health_timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def _reset(self, item: PooledDriver):
+        """清理上一次查询留下的 Cookie、本地存储并回到空白页"""
+        driver = item.driver
+        driver.delete_all_cookies()
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            # about:blank 等页面不允许访问存储
+            pass
+        driver.get("about:blank")
+
+    async def acquire(self) -> PooledDriver:
+        """取出一个健康的浏览器：优先复用空闲实例，未满时新启动一个，否则等待归还"""
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            if not self._idle.empty():
+                item = self._idle.get_nowait()
+            elif self._total < self.size:
+                item = await self._create()
+                break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No browser available within {self.acquire_timeout:.0f}s")
+                self._waiters += 1
+                try:
+                    item = await asyncio.wait_for(self._idle.get(), remaining)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"No browser available within {self.acquire_timeout:.0f}s")
+                finally:
+                    self._waiters -= 1
+            if await self._check(item):
+                break
+            self.crashed += 1
+            logger.warning("Discarding unhealthy browser")
+            await self._discard(item)
+
+        waited = time.perf_counter() - started
+        self.acquires += 1
+        self.acquire_wait_total += waited
+        self.acquire_wait_max = max(self.acquire_wait_max, waited)
+        item.uses += 1
+        return item
+
+    async def release(self, item: PooledDriver, failed: bool = False):
+        """归还浏览器：达到使用次数上限、出错后健康检查失败或清理失败时关闭，否则清理后放回池中"""
+        if self._closed:
+            await self._discard(item)
+            return
+        if item.uses >= self.max_uses:
+            self.recycled += 1
+            await self._discard(item)
+            return
+        if failed and not await self._check(item):
+            self.crashed += 1
+            await self._discard(item)
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._reset, item)
+        except Exception as e:
+            logger.warning(f"Failed to reset browser, discarding: {str(e)}")
+            self.crashed += 1
+            await self._discard(item)
+            return
+        self._idle.put_nowait(item)
+
+    @asynccontextmanager
+    async def driver(self) -> AsyncIterator[Any]:
+        """借用一个浏览器，退出时自动归还并记录占用时长"""
+        item = await self.acquire()
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield item.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            held = time.perf_counter() - started
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+            await asyncio.shield(self.release(item, failed))
+
+    async def close(self):
+        """关闭池中所有空闲浏览器，使用中的浏览器在归还时关闭"""
+        self._closed = True
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+        items = []
+        while not self._idle.empty():
+            items.append(self._idle.get_nowait())
+        await asyncio.gather(*(self._discard(item) for item in items))
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "total": self._total,
+            "idle": self._idle.qsize(),
+            "in_use": self._total - self._idle.qsize(),
+            "created": self.created,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+            "acquires": self.acquires,
+            "acquire_wait_avg_ms": round(self.acquire_wait_total / self.acquires * 1000, 1) if self.acquires else 0.0,
+            "acquire_wait_max_ms": round(self.acquire_wait_max * 1000, 1),
+            "hold_avg_ms": round(self.hold_total / self.acquires * 1000, 1) if self.acquires else 0.0,
+            "hold_max_ms": round(self.hold_max * 1000, 1)
+        }
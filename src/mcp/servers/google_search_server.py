@@ -1,6 +1,11 @@
 import os
+import json
+import time
 import asyncio
-from typing import Any
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from urllib.parse import urlencode, urljoin
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 from selenium import webdriver
@@ -10,14 +15,21 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from driver_pool import DriverPool
+from serp_parser import parse_results
+from search_cache import SearchCache, normalize_query
 import sys
 
 # 设置标准输出为 UTF-8
 sys.stdout.reconfigure(encoding='utf-8')
 
-# 初始化 MCP 服务器
-mcp = FastMCP("GoogleSearchServer")
+# stdout 是 MCP 的 stdio 通道，日志输出到 stderr
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("GoogleSearchServer")
 
 load_dotenv()
 
@@ -25,6 +37,230 @@ load_dotenv()
 CHROME_PATH = os.getenv("CHROME_PATH")
 CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")
 PROXY = os.getenv("PROXY")
+# 浏览器池：最多同时运行的浏览器数、启动时预热的数量、单个浏览器最多处理的查询数和等待空闲浏览器的超时（秒）
+GOOGLE_DRIVER_POOL_SIZE = int(os.getenv("GOOGLE_DRIVER_POOL_SIZE", "2"))
+GOOGLE_DRIVER_PREWARM = int(os.getenv("GOOGLE_DRIVER_PREWARM", "1"))
+GOOGLE_DRIVER_MAX_USES = int(os.getenv("GOOGLE_DRIVER_MAX_USES", "50"))
+GOOGLE_DRIVER_ACQUIRE_TIMEOUT = float(os.getenv("GOOGLE_DRIVER_ACQUIRE_TIMEOUT", "60"))
+# 搜索方式：fast 直接打开结果页 URL 并等待页面就绪，失败时退回 human；human 模拟人工输入
+GOOGLE_SEARCH_MODE = os.getenv("GOOGLE_SEARCH_MODE", "fast").lower()
+# 结果页地址（可指向本地夹具服务）、界面语言、结果数量和单次搜索的整体截止时间（秒）
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.google.com/search")
+GOOGLE_SEARCH_LANG = os.getenv("GOOGLE_SEARCH_LANG", "zh-CN")
+GOOGLE_SEARCH_NUM = int(os.getenv("GOOGLE_SEARCH_NUM", "10"))
+GOOGLE_SEARCH_DEADLINE = float(os.getenv("GOOGLE_SEARCH_DEADLINE", "30"))
+# 快速路径最多占用的时间（秒），截止时间内剩余的时间留给回退的人工模拟路径
+GOOGLE_FAST_PATH_TIMEOUT = float(os.getenv("GOOGLE_FAST_PATH_TIMEOUT", "10"))
+# 搜索结果缓存的 TTL（秒，0 表示关闭）和条目数上限，以及 google_search_many 单次最多的查询数
+GOOGLE_SEARCH_CACHE_TTL = float(os.getenv("GOOGLE_SEARCH_CACHE_TTL", "600"))
+GOOGLE_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("GOOGLE_SEARCH_CACHE_MAX_ENTRIES", "256"))
+GOOGLE_SEARCH_MANY_MAX_QUERIES = int(os.getenv("GOOGLE_SEARCH_MANY_MAX_QUERIES", "20"))
+
+# 页面就绪检查：是否被拦截（验证码）、结果容器是否出现、文档是否加载完成
+READY_SCRIPT = """
+return {
+    blocked: location.pathname.indexOf('/sorry/') === 0 || !!document.getElementById('captcha-form'),
+    results: !!(document.getElementById('search') || document.getElementById('rso')),
+    complete: document.readyState === 'complete'
+};
+"""
+
+class SearchBlockedError(Exception):
+    """快速路径没有拿到结果（验证码、同意页或空结果），需要退回人工模拟路径"""
+
+# 各搜索路径的统计：成功次数、失败次数和成功时的累计耗时
+path_stats: Dict[str, Dict[str, float]] = {
+    path: {"served": 0, "failed": 0, "total_ms": 0.0} for path in ("fast", "human")
+}
+path_stats_fallbacks = 0
+
+# google_search 和 google_search_many 共用的结果缓存
+search_cache = SearchCache(GOOGLE_SEARCH_CACHE_MAX_ENTRIES, GOOGLE_SEARCH_CACHE_TTL) if GOOGLE_SEARCH_CACHE_TTL > 0 else None
+
+def search_cache_key(query: str) -> str:
+    """缓存键：语言、结果数量加规范化后的查询词"""
+    return f"{GOOGLE_SEARCH_LANG}/{GOOGLE_SEARCH_NUM}:{normalize_query(query)}"
+
+def create_driver() -> webdriver.Chrome:
+    """按 .env 配置启动一个 Chrome 浏览器"""
+    # 配置 Chrome 选项
+    chrome_options = Options()
+    if CHROME_PATH:
+        chrome_options.binary_location = CHROME_PATH
+
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    # DOMContentLoaded 后即返回，结果是否可用由就绪条件判断，不等待图片等资源
+    chrome_options.page_load_strategy = "eager"
+
+    if PROXY:
+        chrome_options.add_argument(f'--proxy-server={PROXY}')
+
+    # 设置 WebDriver 服务
+    service = Service(executable_path=CHROMEDRIVER_PATH) if CHROMEDRIVER_PATH else Service()
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+# 复用的浏览器池，并发的查询各自使用一个已启动的浏览器
+driver_pool = DriverPool(
+    create_driver,
+    size=GOOGLE_DRIVER_POOL_SIZE,
+    max_uses=GOOGLE_DRIVER_MAX_USES,
+    acquire_timeout=GOOGLE_DRIVER_ACQUIRE_TIMEOUT
+)
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """服务启动时在后台预热浏览器，退出时关闭所有浏览器"""
+    driver_pool.start(GOOGLE_DRIVER_PREWARM)
+    try:
+        yield
+    finally:
+        await driver_pool.close()
+
+# 初始化 MCP 服务器
+mcp = FastMCP("GoogleSearchServer", lifespan=lifespan)
+
+def remaining_time(deadline: float) -> float:
+    """距离截止时间的剩余秒数，已超时则抛出 TimeoutError"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"搜索超过截止时间（{GOOGLE_SEARCH_DEADLINE:.0f}s）")
+    return remaining
+
+def build_search_url(query: str) -> str:
+    """构造带查询词、语言和结果数量参数的结果页 URL"""
+    return f"{GOOGLE_SEARCH_URL}?{urlencode({'q': query, 'hl': GOOGLE_SEARCH_LANG, 'num': GOOGLE_SEARCH_NUM})}"
+
+def page_ready(driver: webdriver.Chrome):
+    """就绪条件：被拦截、结果容器已出现或文档已加载完成时返回页面状态，否则返回 False 继续等待"""
+    state = driver.execute_script(READY_SCRIPT)
+    return state if state["blocked"] or state["results"] or state["complete"] else False
+
+def fast_search(driver: webdriver.Chrome, query: str, deadline: float) -> List[Dict[str, str]]:
+    """快速路径：直接打开结果页，等待结果容器出现或页面加载完成，不做固定等待；最多占用 GOOGLE_FAST_PATH_TIMEOUT 秒"""
+    fast_deadline = time.monotonic() + min(GOOGLE_FAST_PATH_TIMEOUT, remaining_time(deadline))
+    driver.set_page_load_timeout(remaining_time(fast_deadline))
+    driver.get(build_search_url(query))
+    logger.debug(f"Fast path - Opened results page for query: {query}")
+
+    state = WebDriverWait(driver, remaining_time(fast_deadline), poll_frequency=0.1).until(page_ready)
+    if state["blocked"]:
+        raise SearchBlockedError("结果页被验证码拦截")
+
+    results = parse_results(driver.page_source, limit=10)
+    if not results:
+        raise SearchBlockedError("结果页中没有解析到搜索结果")
+    return results
+
+def human_search(driver: webdriver.Chrome, query: str, deadline: float) -> List[Dict[str, str]]:
+    """人工模拟路径：打开首页、逐字输入、提交并滚动页面"""
+    driver.set_page_load_timeout(remaining_time(deadline))
+    # 打开谷歌搜索页面
+    driver.get(urljoin(GOOGLE_SEARCH_URL, "/"))
+    logger.debug(f"Step 1 - Opened Google homepage for query: {query}")
+
+    # 等待搜索框出现
+    search_box = WebDriverWait(driver, min(10, remaining_time(deadline))).until(
+        EC.presence_of_element_located((By.NAME, "q"))
+    )
+    logger.debug("Step 2 - Search box located")
+
+    # 模拟人工输入
+    for char in query:
+        search_box.send_keys(char)
+        time.sleep(0.05)
+
+    time.sleep(0.5)
+    search_box.send_keys(Keys.RETURN)
+    logger.debug(f"Step 3 - Search submitted for query: {query}")
+
+    # 等待搜索结果加载
+    try:
+        WebDriverWait(driver, min(10, remaining_time(deadline))).until(
+            EC.presence_of_element_located((By.ID, "search"))
+        )
+        logger.debug("Step 4 - Search results container loaded")
+    except TimeoutException:
+        logger.warning("Step 4 - Timeout waiting for results, possible CAPTCHA")
+        time.sleep(min(10, remaining_time(deadline)))
+
+    # 确保页面滚动加载更多结果
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    time.sleep(min(3, remaining_time(deadline)))
+    logger.debug("Step 5 - Scrolled page to load more results")
+
+    # 一次取回页面源码，在进程内解析，避免逐个元素的 WebDriver 往返
+    started = time.perf_counter()
+    results = parse_results(driver.page_source, limit=10)
+    logger.debug(f"Step 6 - Extracted {len(results)} results in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return results
+
+def record_path(path: str, started: float, ok: bool):
+    stats = path_stats[path]
+    if ok:
+        stats["served"] += 1
+        stats["total_ms"] += (time.perf_counter() - started) * 1000
+    else:
+        stats["failed"] += 1
+
+def run_search(driver: webdriver.Chrome, query: str) -> Tuple[str, List[Dict[str, str]]]:
+    """在给定的浏览器中执行一次搜索，返回 (搜索路径, 结果)；Selenium 调用是阻塞的，在后台线程中运行"""
+    global path_stats_fallbacks
+    deadline = time.monotonic() + GOOGLE_SEARCH_DEADLINE
+    if GOOGLE_SEARCH_MODE == "fast":
+        started = time.perf_counter()
+        try:
+            results = fast_search(driver, query, deadline)
+            record_path("fast", started, True)
+            return "fast", results
+        except (SearchBlockedError, TimeoutError, WebDriverException) as e:
+            # 被拦截、超时和页面加载错误（如 net::ERR_*）都退回人工模拟路径
+            record_path("fast", started, False)
+            path_stats_fallbacks += 1
+            logger.warning(f"Fast path failed for query '{query}', falling back to human emulation: {str(e)}")
+        except Exception:
+            record_path("fast", started, False)
+            raise
+
+    started = time.perf_counter()
+    try:
+        results = human_search(driver, query, deadline)
+    except Exception:
+        record_path("human", started, False)
+        raise
+    record_path("human", started, True)
+    return "human", results
+
+def format_results(query: str, results: List[Dict[str, str]]) -> str:
+    """把结果格式化为编号列表"""
+    if not results:
+        return "未找到非广告搜索结果"
+    output = "\n\n".join(
+        f"{index}. {result['title']}\n"
+        f"   链接: {result['link']}\n"
+        f"   摘要: {result['snippet'] or '暂无摘要'}\n"
+        for index, result in enumerate(results, 1)
+    )
+    return f"谷歌搜索 '{query}' 的结果：\n\n{output}"
+
+async def search_results(query: str) -> List[Dict[str, str]]:
+    """返回查询的搜索结果：优先使用缓存，相同查询（规范化后、同一语言和结果数）的并发请求只搜索一次"""
+    async def load() -> List[Dict[str, str]]:
+        # 从浏览器池借用已启动的浏览器，在后台线程中运行 Selenium
+        async with driver_pool.driver() as driver:
+            loop = asyncio.get_running_loop()
+            path, results = await loop.run_in_executor(None, run_search, driver, query)
+        logger.info(f"Search '{query}' served by {path} path with {len(results)} results")
+        return results
+
+    if search_cache is None:
+        return await load()
+    return await search_cache.search(search_cache_key(query), load)
 
 @mcp.tool(description="使用 Selenium 搜索 Google，返回前 10 个非广告搜索结果的标题、链接和摘要。输入参数为搜索关键词（如 'Python tutorial'）")
 async def google_search(query: str) -> str:
@@ -41,137 +277,60 @@ async def google_search(query: str) -> str:
         return "⚠️ 请提供搜索关键词"
 
     try:
-        # 配置 Chrome 选项
-        chrome_options = Options()
-        if CHROME_PATH:
-            chrome_options.binary_location = CHROME_PATH
-            
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-        
-        if PROXY:
-            chrome_options.add_argument(f'--proxy-server={PROXY}')
-
-        # 设置 WebDriver 服务
-        service = Service(executable_path=CHROMEDRIVER_PATH) if CHROMEDRIVER_PATH else Service()
-
-        # 在异步线程中运行 Selenium
-        loop = asyncio.get_event_loop()
-        driver = await loop.run_in_executor(
-            None,
-            lambda: webdriver.Chrome(service=service, options=chrome_options)
-        )
-
-        try:
-            # 打开谷歌搜索页面
-            driver.get("https://www.google.com")
-            print(f"DEBUG: Step 1 - Opened Google homepage for query: {query}")
-
-            # 等待搜索框出现
-            wait = WebDriverWait(driver, 10)
-            search_box = wait.until(EC.presence_of_element_located((By.NAME, "q")))
-            print("DEBUG: Step 2 - Search box located")
-
-            # 模拟人工输入
-            for char in query:
-                search_box.send_keys(char)
-                await asyncio.sleep(0.05)
-            
-            await asyncio.sleep(0.5)
-            search_box.send_keys(Keys.RETURN)
-            print(f"DEBUG: Step 3 - Search submitted for query: {query}")
-
-            # 等待搜索结果加载
-            try:
-                wait.until(EC.presence_of_element_located((By.ID, "search")))
-                print("DEBUG: Step 4 - Search results container loaded")
-            except TimeoutException:
-                print("DEBUG: Step 4 - Timeout waiting for results, possible CAPTCHA")
-                await asyncio.sleep(10)
-
-            # 确保页面滚动加载更多结果
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            await asyncio.sleep(3)
-            print("DEBUG: Step 5 - Scrolled page to load more results")
-
-            # 使用 XPath 提取搜索结果
-            results = driver.find_elements(By.XPATH, "//a[descendant::h3]")
-            print(f"DEBUG: Step 6 - Found {len(results)} raw results")
-            result_list = []
-            count = 0
-
-            for result in results:
-                if count >= 10:  # 限制前 10 个非广告结果
-                    break
-                try:
-                    # 检查是否为广告
-                    parent = result.find_element(By.XPATH, "./ancestor::div[contains(@class, 'tF2Cxc') or contains(@class, 'yuRUbf') or contains(@class, 'g')]")
-                    if parent.find_elements(By.XPATH, ".//ancestor::*[contains(text(), 'Ad')]") or \
-                       parent.find_elements(By.XPATH, ".//ancestor::*[contains(text(), '赞助')]"):
-                        print(f"DEBUG: Skipping ad at position {count + 1}")
-                        continue
-
-                    # 获取标题和链接
-                    try:
-                        title_element = result.find_element(By.TAG_NAME, "h3")
-                        title = title_element.text
-                        link = result.get_attribute("href")
-                        if not link or "google.com" in link:
-                            continue
-                    except NoSuchElementException:
-                        print(f"DEBUG: No title/link found for result {count + 1}")
-                        continue
-                    
-                    # 获取摘要内容
-                    try:
-                        snippet_candidates = [
-                            ".//following-sibling::div//span[@class='aCOpRe']",
-                            ".//following-sibling::div[contains(@class, 'VwiC3b') or contains(@class, 'IsZvec')]",
-                            ".//following-sibling::div//span"
-                        ]
-                        snippet = "暂无摘要"
-                        for xpath in snippet_candidates:
-                            try:
-                                snippet_element = parent.find_element(By.XPATH, xpath)
-                                snippet = snippet_element.text.strip()
-                                if snippet:
-                                    break
-                            except NoSuchElementException:
-                                continue
-                        if snippet == "暂无摘要":
-                            print(f"DEBUG: No snippet found for result {count + 1}")
-                    except Exception as e:
-                        print(f"DEBUG: Error finding snippet for result {count + 1}: {str(e)}")
-
-                    count += 1
-                    result_list.append(
-                        f"{count}. {title}\n"
-                        f"   链接: {link}\n"
-                        f"   摘要: {snippet}\n"
-                    )
-                except Exception as e:
-                    print(f"DEBUG: Error processing result {count + 1}: {str(e)}")
-                    continue
-
-            if not result_list:
-                return "未找到非广告搜索结果"
-            
-            output = "\n\n".join(result_list)
-            print(f"DEBUG: Step 7 - Final results: {output}")
-            return f"谷歌搜索 '{query}' 的结果：\n\n{output}"
-
-        finally:
-            print("DEBUG: Step 8 - Closing browser")
-            await loop.run_in_executor(None, driver.quit)
-
+        return format_results(query, await search_results(query))
     except Exception as e:
         return f"⚠️ 搜索失败: {str(e)}"
 
+@mcp.tool(description="同时搜索多个关键词，每个关键词返回前 per_query_limit 个非广告结果的标题、链接和摘要。输入参数为关键词列表（如 ['Python tutorial', 'asyncio']）和每个关键词的结果数（默认 5）")
+async def google_search_many(queries: List[str], per_query_limit: int = 5) -> str:
+    """
+    在多个浏览器中并行搜索多个关键词，结果按输入顺序分段返回，单个关键词失败不影响其他关键词。
+
+    Args:
+        queries (List[str]): 搜索关键词列表
+        per_query_limit (int): 每个关键词返回的结果数（1-10）
+
+    Returns:
+        str: 各关键词的搜索结果
+    """
+    queries = [query for query in queries if query and query.strip()]
+    if not queries:
+        return "⚠️ 请提供搜索关键词"
+    if len(queries) > GOOGLE_SEARCH_MANY_MAX_QUERIES:
+        return f"⚠️ 一次最多搜索 {GOOGLE_SEARCH_MANY_MAX_QUERIES} 个关键词"
+    limit = min(max(1, per_query_limit), 10)
+
+    # 并发数受浏览器池大小限制，相同的关键词通过缓存合并为一次搜索
+    outcomes = await asyncio.gather(*(search_results(query) for query in queries), return_exceptions=True)
+    sections = []
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, Exception):
+            sections.append(f"⚠️ 搜索 '{query}' 失败: {str(outcome)}")
+        else:
+            sections.append(format_results(query, outcome[:limit]))
+    return "\n\n".join(sections)
+
+def get_path_stats() -> dict:
+    """各搜索路径的成功、失败次数和平均耗时"""
+    paths = {
+        path: {
+            "served": int(stats["served"]),
+            "failed": int(stats["failed"]),
+            "avg_ms": round(stats["total_ms"] / stats["served"], 1) if stats["served"] else 0.0
+        }
+        for path, stats in path_stats.items()
+    }
+    return {"mode": GOOGLE_SEARCH_MODE, "fallbacks": path_stats_fallbacks, "paths": paths}
+
+@mcp.tool(description="查看谷歌搜索服务的状态：浏览器池的数量、复用和回收次数、借用等待和占用耗时，快速路径和人工模拟路径各自处理的查询数，以及结果缓存的命中情况")
+async def google_search_stats() -> str:
+    """返回浏览器池、搜索路径和结果缓存的统计信息（JSON）"""
+    return json.dumps({
+        "driver_pool": driver_pool.stats(),
+        "search": get_path_stats(),
+        "cache": search_cache.stats() if search_cache else None
+    }, ensure_ascii=False, indent=2)
+
 if __name__ == "__main__":
-    print("DEBUG: Starting MCP GoogleSearchServer")
+    logger.info("Starting MCP GoogleSearchServer")
     mcp.run(transport="stdio")
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+Results = List[Dict[str, str]]
+
+def normalize_query(query: str) -> str:
+    """规范化查询词：全角转半角、转小写、合并空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+class SearchCache:
+    """搜索结果缓存：按 TTL 过期、按条目数做 LRU 淘汰，同一查询的并发请求共享一次搜索，空结果不缓存"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # 缓存键 -> (过期时间, 结果)
+        self._entries: "OrderedDict[str, Tuple[float, Results]]" = OrderedDict()
+        self._searching: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def lookup(self, key: str) -> Optional[Results]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def search(self, key: str, search: Callable[[], Awaitable[Results]]) -> Results:
+        """返回缓存的结果，没有时执行 search；正在搜索同一个键时等待那次搜索的结果"""
+        results = self.lookup(key)
+        if results is not None:
+            self.hits += 1
+            return results
+        task = self._searching.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._search(key, search))
+            self._searching[key] = task
+        else:
+            self.coalesced += 1
+        # 某个调用方被取消时，搜索继续进行，其他调用方照常拿到结果
+        return await asyncio.shield(task)
+
+    async def _search(self, key: str, search: Callable[[], Awaitable[Results]]) -> Results:
+        try:
+            results = await search()
+        finally:
+            del self._searching[key]
+        # 空结果可能是被拦截或页面异常，不缓存
+        if results:
+            self._entries[key] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "searching": len(self._searching)
+        }
@@ -0,0 +1,215 @@
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+# 不会有结束标签的元素
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"
+}
+# 内容与搜索结果无关、直接跳过的元素
+SKIPPED_ELEMENTS = {"script", "style", "noscript", "svg", "template"}
+# 单条搜索结果的容器 class
+RESULT_BLOCK_CLASSES = {"g", "tF2Cxc", "MjjYud", "N54PNb", "Gx5Zad"}
+# 摘要所在元素的 class
+SNIPPET_CLASSES = {"VwiC3b", "IsZvec", "aCOpRe", "st", "BNeawe"}
+# 广告区域的 id 和广告标签文字
+AD_CONTAINER_IDS = {"tads", "tadsb", "bottomads", "tvcap"}
+AD_LABELS = {"ad", "ads", "sponsored", "赞助", "赞助商", "广告"}
+# 谷歌用来高亮查询词的元素，其中的文字不会是广告标签
+EMPHASIS_ELEMENTS = {"em", "b", "strong"}
+
+class Node:
+    """精简的 DOM 节点，只保留提取结果需要的信息"""
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional["Node"]):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List[Union["Node", str]] = []
+        self.parent = parent
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get("class", "").split()
+
+    def iter(self) -> Iterator["Node"]:
+        """按文档顺序遍历子树中的元素（含自身）"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    def texts(self) -> Iterator[str]:
+        """按文档顺序产出子树中的文本片段"""
+        stack: List[Union[Node, str]] = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            else:
+                stack.extend(reversed(node.children))
+
+    def text(self) -> str:
+        """子树的文本：元素之间以空格分隔，高亮元素与相邻文字直接相连（如 专业<em>广告</em>设计）"""
+        parts: List[str] = []
+        stack: List[Union[Node, str]] = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.tag in EMPHASIS_ELEMENTS:
+                stack.extend(reversed(node.children))
+            else:
+                parts.append(" ")
+                stack.append(" ")
+                stack.extend(reversed(node.children))
+        return " ".join("".join(parts).split())
+
+    def ancestors(self) -> Iterator["Node"]:
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+class TreeBuilder(HTMLParser):
+    """一次扫描构建精简 DOM，容忍未闭合和错误嵌套的标签"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {}, None)
+        self.current = self.root
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_depth:
+            if tag in SKIPPED_ELEMENTS:
+                self.skip_depth += 1
+            return
+        if tag in SKIPPED_ELEMENTS:
+            self.skip_depth = 1
+            return
+        node = Node(tag, {name: value or "" for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        if self.skip_depth or tag in SKIPPED_ELEMENTS:
+            return
+        self.current.children.append(Node(tag, {name: value or "" for name, value in attrs}, self.current))
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag in SKIPPED_ELEMENTS:
+                self.skip_depth -= 1
+            return
+        # 找到最近的同名未闭合元素并关闭，没有则忽略这个结束标签
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if data.strip():
+            self.current.children.append(data)
+        elif self.current.tag in EMPHASIS_ELEMENTS or self.current.children:
+            # 只保留可能分隔两个高亮词的空白（如 <em>a</em> <em>b</em>）
+            self.current.children.append(" ")
+
+def parse_html(html: str) -> Node:
+    """解析 HTML，返回文档根节点"""
+    builder = TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+def resolve_link(href: str) -> str:
+    """还原谷歌的跳转链接（/url?q=...），其他链接原样返回"""
+    if href.startswith("/url?") or href.startswith("https://www.google.com/url?"):
+        target = parse_qs(urlparse(href).query).get("q") or parse_qs(urlparse(href).query).get("url")
+        if target:
+            return target[0]
+    return href
+
+def find_block(link: Node) -> Node:
+    """找到搜索结果所在的容器，找不到时退回到链接的祖父元素"""
+    for ancestor in link.ancestors():
+        if ancestor.tag == "div" and RESULT_BLOCK_CLASSES.intersection(ancestor.classes):
+            return ancestor
+    return link.parent.parent if link.parent is not None and link.parent.parent is not None else link
+
+def header_texts(block: Node) -> Iterator[str]:
+    """产出结果容器中摘要以外的文本片段，跳过摘要元素和高亮查询词的元素"""
+    stack: List[Union[Node, str]] = [block]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            yield node
+        elif node.tag not in EMPHASIS_ELEMENTS and not SNIPPET_CLASSES.intersection(node.classes):
+            stack.extend(reversed(node.children))
+
+def is_ad(link: Node, block: Node) -> bool:
+    """位于广告区域内、带有广告属性，或结果标题区域有单独的广告标签文字时视为广告
+
+    摘要中高亮的查询词（如搜索“广告设计”时的 <em>广告</em>）不算广告标签。
+    """
+    for ancestor in link.ancestors():
+        if ancestor.attrs.get("id") in AD_CONTAINER_IDS or "data-text-ad" in ancestor.attrs:
+            return True
+    return any(text.strip().lower().rstrip("·:：").strip() in AD_LABELS for text in header_texts(block))
+
+def find_snippet(block: Node, link: Node) -> str:
+    """在结果容器中链接以外的部分查找摘要：优先取摘要 class 的元素，否则取第一个有内容的 span"""
+    # 跳过链接本身，以及包含链接的元素（它们的文本里有标题）
+    link_ancestors = set(map(id, link.ancestors()))
+    candidates = []
+    stack = [block]
+    while stack:
+        node = stack.pop()
+        if node is link:
+            continue
+        if id(node) not in link_ancestors:
+            candidates.append(node)
+        stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    for node in candidates:
+        if SNIPPET_CLASSES.intersection(node.classes):
+            text = node.text()
+            if text:
+                return text
+    for node in candidates:
+        if node.tag == "span":
+            text = node.text()
+            if text:
+                return text
+    return ""
+
+def parse_results(html: str, limit: int = 10) -> List[Dict[str, str]]:
+    """从搜索结果页 HTML 中提取前 limit 个非广告结果的标题、链接和摘要"""
+    root = parse_html(html)
+    results: List[Dict[str, str]] = []
+    seen = set()
+    for node in root.iter():
+        if len(results) >= limit:
+            break
+        if node.tag != "a" or not node.attrs.get("href"):
+            continue
+        title_node = next((child for child in node.iter() if child.tag == "h3"), None)
+        if title_node is None:
+            continue
+        link = resolve_link(node.attrs["href"])
+        if not link.startswith("http") or "google.com" in link or link in seen:
+            continue
+        block = find_block(node)
+        if is_ad(node, block):
+            continue
+        title = title_node.text()
+        if not title:
+            continue
+        seen.add(link)
+        results.append({"title": title, "link": link, "snippet": find_snippet(block, node)})
+    return results
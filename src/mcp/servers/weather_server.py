@@ -1,60 +1,243 @@
 import json
 import httpx
-from typing import Any
+import asyncio
+import importlib.util
+import logging
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 import os
 
-# 初始化 MCP 服务器
-mcp = FastMCP("WeatherServer")
+# stdout 是 MCP 的 stdio 通道，日志输出到 stderr
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WeatherServer")
+# httpx 的请求日志会带上包含 API Key 的完整 URL
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 load_dotenv()
 
+# 共享 HTTP 连接池：最大连接数、保持的空闲连接数和空闲连接的保活时间（秒）
+WEATHER_HTTP_MAX_CONNECTIONS = int(os.getenv("WEATHER_HTTP_MAX_CONNECTIONS", "20"))
+WEATHER_HTTP_MAX_KEEPALIVE = int(os.getenv("WEATHER_HTTP_MAX_KEEPALIVE", "10"))
+WEATHER_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("WEATHER_HTTP_KEEPALIVE_EXPIRY", "60"))
+# 批量查询时同时进行的请求数上限
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "8"))
+# 安装了 h2 时启用 HTTP/2，多个请求复用同一条连接
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# 高德天气接口地址，测试时可指向本地桩服务
+GAODE_WEATHER_URL = os.getenv("GAODE_WEATHER_URL", "https://restapi.amap.com/v3/weather/weatherInfo")
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+# 天气缓存：是否启用、SQLite 持久化文件（为空则只在内存中，相对路径相对于项目根目录，与启动时的工作目录无关）
+WEATHER_CACHE_ENABLED = os.getenv("WEATHER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+WEATHER_CACHE_FILE = os.getenv("WEATHER_CACHE_FILE", "weather_cache.db")
+if WEATHER_CACHE_FILE:
+    WEATHER_CACHE_FILE = str(PROJECT_ROOT / WEATHER_CACHE_FILE)
+# 实况和预报数据的发布间隔（秒），缓存在 reporttime 加上发布间隔后过期
+WEATHER_LIVE_INTERVAL = float(os.getenv("WEATHER_LIVE_INTERVAL", "3600"))
+WEATHER_FORECAST_INTERVAL = float(os.getenv("WEATHER_FORECAST_INTERVAL", "10800"))
+# 已过预计发布时间但接口仍返回旧数据时，重新请求的最小间隔（秒）
+WEATHER_RECHECK_INTERVAL = float(os.getenv("WEATHER_RECHECK_INTERVAL", "300"))
+# reporttime 为北京时间
+REPORT_TIMEZONE = timezone(timedelta(hours=8))
+
+def parse_reporttime(reporttime: str) -> Optional[float]:
+    """把高德返回的 reporttime（北京时间）转换为时间戳，格式不对时返回 None"""
+    try:
+        return datetime.strptime(reporttime, "%Y-%m-%d %H:%M:%S").replace(tzinfo=REPORT_TIMEZONE).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class WeatherCache:
+    """天气结果缓存：按 (城市代码, extensions) 缓存，根据 reporttime 推算下一次发布时间过期，可持久化到 SQLite"""
+
+    def __init__(
+        self,
+        db_file: Optional[str] = None,
+        live_interval: float = WEATHER_LIVE_INTERVAL,
+        forecast_interval: float = WEATHER_FORECAST_INTERVAL,
+        recheck_interval: float = WEATHER_RECHECK_INTERVAL
+    ):
+        self.live_interval = live_interval
+        self.forecast_interval = forecast_interval
+        self.recheck_interval = recheck_interval
+        self._entries: Dict[Tuple[str, str], Tuple[dict, float]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if db_file:
+            self._open(db_file)
+
+    def _open(self, db_file: str):
+        """打开 SQLite 文件并载入未过期的条目，重启后直接命中"""
+        try:
+            self._db = sqlite3.connect(db_file)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS weather_cache ("
+                "city TEXT NOT NULL, extensions TEXT NOT NULL, data TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (city, extensions))"
+            )
+            self._db.execute("DELETE FROM weather_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            for city, extensions, data, expires_at in self._db.execute(
+                "SELECT city, extensions, data, expires_at FROM weather_cache"
+            ):
+                self._entries[(city, extensions)] = (json.loads(data), expires_at)
+            logger.info(f"Loaded {len(self._entries)} weather cache entries from {db_file}")
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Weather cache persistence disabled: {str(e)}")
+            self._db = None
+
+    def expires_at(self, data: dict, extensions: str) -> float:
+        """过期时间为 reporttime 加发布间隔；已过该时间（接口还没发布新数据）时至少隔 recheck_interval 再请求"""
+        now = time.time()
+        interval = self.forecast_interval if extensions == "all" else self.live_interval
+        reported = parse_reporttime(data.get("reporttime"))
+        if reported is None:
+            return now + self.recheck_interval
+        # 本地时钟与接口时间有偏差时，缓存时长不超过一个发布间隔
+        return min(max(reported + interval, now + self.recheck_interval), now + interval)
+
+    def get(self, city: str, extensions: str) -> Optional[dict]:
+        entry = self._entries.get((city, extensions))
+        if entry is None or entry[1] <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, city: str, extensions: str, data: dict):
+        expires_at = self.expires_at(data, extensions)
+        self._entries[(city, extensions)] = (data, expires_at)
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO weather_cache (city, extensions, data, expires_at) VALUES (?, ?, ?, ?)",
+                (city, extensions, json.dumps(data, ensure_ascii=False), expires_at)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Error saving weather cache entry: {str(e)}")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
 class GaodeWeatherTool:
     def __init__(self, api_key = os.getenv("GAODE_API_KEY")):
         """初始化高德天气工具"""
         self.api_key = api_key
-        self.base_url = "https://restapi.amap.com/v3/weather/weatherInfo"
+        self.base_url = GAODE_WEATHER_URL
         self.headers = {"User-Agent": "weather-app/1.0"}
+        self.client: Optional[httpx.AsyncClient] = None
+        self.cache: Optional[WeatherCache] = WeatherCache(WEATHER_CACHE_FILE or None) if WEATHER_CACHE_ENABLED else None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """返回长期复用的 HTTP 客户端，连接保持 keep-alive，避免每次查询重新握手"""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=10.0,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=WEATHER_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=WEATHER_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=WEATHER_HTTP_KEEPALIVE_EXPIRY
+                )
+            )
+            logger.info(f"HTTP client created (http2={HTTP2_AVAILABLE}, max_connections={WEATHER_HTTP_MAX_CONNECTIONS})")
+        return self.client
+
+    async def close(self):
+        """关闭 HTTP 客户端及其连接池，以及缓存文件"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.cache is not None:
+            self.cache.close()
 
     async def query_weather(self, city: str, extensions: str = "base") -> dict:
         """
-        从高德地图 API 查询天气信息。
+        查询天气信息，优先使用缓存，出错的结果不缓存。
         :param city: 高德地图城市代码（例如北京是 '110000'）
         :param extensions: 'base' 为实时天气，'all' 为预报天气
         :return: 天气数据字典，若出错则包含 error 字段
         """
+        if self.cache is not None:
+            cached = self.cache.get(city, extensions)
+            if cached is not None:
+                return cached
+        data = await self.fetch_weather(city, extensions)
+        if self.cache is not None and "error" not in data and "message" not in data:
+            self.cache.put(city, extensions, data)
+        return data
+
+    async def fetch_weather(self, city: str, extensions: str = "base") -> dict:
+        """从高德地图 API 查询天气信息，'all' 返回预报数据"""
         params = {
             "key": self.api_key,
             "city": city,
             "extensions": extensions,
             "output": "json"
         }
-        print(f"DEBUG: Querying weather for city: {city}, params: {params}")
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(self.base_url, params=params, headers=self.headers, timeout=10.0)
-                print(f"DEBUG: Response status: {response.status_code}, content: {response.text}")
-                response.raise_for_status()
-                data = response.json()
-                if data.get("status") != "1":
-                    return {"error": f"API error: {data.get('info', 'Unknown error')}"}
-                lives = data.get("lives", [])
-                if not lives:
-                    return {"message": "No weather data found for this city"}
-                weather_info = lives[0]
-                result = {
-                    "city": weather_info.get("city", "Unknown"),
-                    "weather": weather_info.get("weather", "Unknown"),
-                    "temperature": weather_info.get("temperature", "Unknown"),
-                    "winddirection": weather_info.get("winddirection", "Unknown"),
-                    "windpower": weather_info.get("windpower", "Unknown"),
-                    "humidity": weather_info.get("humidity", "Unknown"),
-                    "reporttime": weather_info.get("reporttime", "Unknown")
+        logger.debug(f"Querying weather for city: {city}, extensions: {extensions}")
+        try:
+            response = await self.get_client().get(self.base_url, params=params)
+            logger.debug(f"Response status: {response.status_code}, content: {response.text}")
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") != "1":
+                return {"error": f"API error: {data.get('info', 'Unknown error')}"}
+            if extensions == "all":
+                forecasts = data.get("forecasts", [])
+                if not forecasts or not forecasts[0].get("casts"):
+                    return {"message": "No forecast data found for this city"}
+                forecast = forecasts[0]
+                return {
+                    "city": forecast.get("city", "Unknown"),
+                    "province": forecast.get("province", ""),
+                    "reporttime": forecast.get("reporttime", "Unknown"),
+                    "casts": forecast["casts"]
                 }
-                return result
-            except httpx.RequestException as e:
-                return {"error": f"Weather query error: {str(e)}"}
+            lives = data.get("lives", [])
+            if not lives:
+                return {"message": "No weather data found for this city"}
+            weather_info = lives[0]
+            result = {
+                "city": weather_info.get("city", "Unknown"),
+                "weather": weather_info.get("weather", "Unknown"),
+                "temperature": weather_info.get("temperature", "Unknown"),
+                "winddirection": weather_info.get("winddirection", "Unknown"),
+                "windpower": weather_info.get("windpower", "Unknown"),
+                "humidity": weather_info.get("humidity", "Unknown"),
+                "reporttime": weather_info.get("reporttime", "Unknown")
+            }
+            return result
+        except httpx.HTTPError as e:
+            return {"error": f"Weather query error: {str(e)}"}
+
+    async def query_weather_many(self, cities: List[str], extensions: str = "base") -> List[dict]:
+        """并发查询多个城市，同时进行的请求数不超过 WEATHER_BATCH_CONCURRENCY，结果与输入顺序一致"""
+        semaphore = asyncio.Semaphore(max(1, WEATHER_BATCH_CONCURRENCY))
+
+        async def query_one(city: str) -> dict:
+            async with semaphore:
+                return await self.query_weather(city, extensions)
+
+        unique_cities = list(dict.fromkeys(cities))
+        results = await asyncio.gather(*(query_one(city) for city in unique_cities))
+        by_city = dict(zip(unique_cities, results))
+        return [by_city[city] for city in cities]
 
     def format_weather(self, weather_data: dict) -> str:
         """将天气数据格式化为易读文本"""
@@ -72,9 +255,39 @@ class GaodeWeatherTool:
             f"⏰ 更新时间: {weather_data['reporttime']}\n"
         )
 
+    def format_forecast(self, forecast_data: dict) -> str:
+        """将预报数据格式化为易读文本，每天一行"""
+        if "error" in forecast_data:
+            return f"⚠️ {forecast_data['error']}"
+        if "message" in forecast_data:
+            return f"⚠️ {forecast_data['message']}"
+
+        lines = [f"🌍 {forecast_data['province']} {forecast_data['city']} 天气预报"]
+        for cast in forecast_data["casts"]:
+            lines.append(
+                f"📅 {cast.get('date', '')} 周{cast.get('week', '')}: "
+                f"白天 {cast.get('dayweather', '')} {cast.get('daytemp', '')}°C，"
+                f"夜间 {cast.get('nightweather', '')} {cast.get('nighttemp', '')}°C，"
+                f"{cast.get('daywind', '')}风 {cast.get('daypower', '')} 级"
+            )
+        lines.append(f"⏰ 更新时间: {forecast_data['reporttime']}")
+        return "\n".join(lines) + "\n"
+
 # 实例化天气工具
 weather_tool = GaodeWeatherTool()
 
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """服务启动时创建 HTTP 连接池，退出时关闭连接池和缓存文件"""
+    weather_tool.get_client()
+    try:
+        yield
+    finally:
+        await weather_tool.close()
+
+# 初始化 MCP 服务器
+mcp = FastMCP("WeatherServer", lifespan=lifespan)
+
 @mcp.tool()
 async def query_weather(city_code: str) -> str:
     """
@@ -85,6 +298,30 @@ async def query_weather(city_code: str) -> str:
     data = await weather_tool.query_weather(city_code, extensions="base")
     return weather_tool.format_weather(data)
 
+@mcp.tool()
+async def query_weather_forecast(city_code: str) -> str:
+    """
+    输入高德地图城市代码，返回未来几天（含今天）的天气预报。
+    :param city_code: 高德地图城市代码（例如北京是 '110000'）
+    :return: 格式化后的天气预报
+    """
+    data = await weather_tool.query_weather(city_code, extensions="all")
+    return weather_tool.format_forecast(data)
+
+@mcp.tool()
+async def query_weather_batch(city_codes: List[str]) -> str:
+    """
+    输入多个高德地图城市代码，并发查询并一次返回各城市的今日天气。
+    :param city_codes: 高德地图城市代码列表（例如 ['110000', '330100']）
+    :return: 格式化后的各城市天气信息
+    """
+    if not city_codes:
+        return "⚠️ 城市代码列表为空"
+    results = await weather_tool.query_weather_many(city_codes, extensions="base")
+    return "\n".join(
+        f"[{code}]\n{weather_tool.format_weather(data)}" for code, data in zip(city_codes, results)
+    )
+
 if __name__ == "__main__":
-    print("DEBUG: Starting MCP WeatherServer")
+    logger.info("Starting MCP WeatherServer")
     mcp.run(transport='stdio')
\ No newline at end of file